@@ -0,0 +1,260 @@
+"""
+Load test and benchmark harness.
+
+Starts the fake GitHub server (fake_github.py) and the tracker app as local
+uvicorn processes, then drives a weighted mix of create/get/update/delete/list
+requests at each concurrency level and reports throughput and p50/p95/p99
+latency per operation. The same --seed gives the same operation mix, so runs
+before and after a change can be compared directly; every run creates repos
+under its own random owner, so a reused database never turns creates into
+fresh-row hits.
+
+    python benchmark.py --concurrency 1,10,50 --requests 2000 --github-latency 0.05
+    python benchmark.py --target http://127.0.0.1:8000 --json results.json
+
+The app uses DATABASE_URL as usual; point it at a scratch database, since the
+run creates, updates and deletes rows. Its schema is bootstrapped first.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+OPERATIONS = ("create", "get", "update", "delete", "list")
+DEFAULT_MIX = "create=20,get=50,update=15,delete=5,list=10"
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {name}")
+        mix[name] = int(weight)
+    if not any(mix.values()):
+        raise ValueError("Mix needs at least one operation with a positive weight")
+    return mix
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    # Nearest-rank percentile over already sorted samples.
+    if not samples:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(samples)), 1)
+    return samples[rank - 1]
+
+
+def summarize(latencies: dict[str, list[float]], errors: dict[str, int], elapsed: float) -> dict:
+    operations = {}
+    for name, samples in latencies.items():
+        samples.sort()
+        operations[name] = {
+            "requests": len(samples),
+            "errors": errors.get(name, 0),
+            "p50_ms": percentile(samples, 50) * 1000,
+            "p95_ms": percentile(samples, 95) * 1000,
+            "p99_ms": percentile(samples, 99) * 1000,
+        }
+    total = sum(len(samples) for samples in latencies.values())
+    everything = sorted(sample for samples in latencies.values() for sample in samples)
+    return {
+        "requests": total,
+        "errors": sum(errors.values()),
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(everything, 50) * 1000,
+        "p95_ms": percentile(everything, 95) * 1000,
+        "p99_ms": percentile(everything, 99) * 1000,
+        "operations": operations,
+    }
+
+
+class Workload:
+    # Picks operations from the mix and keeps track of the ids created so far,
+    # so get/update/delete hit rows that exist. The seed only drives the mix;
+    # the owner namespace is new on every run.
+    def __init__(self, mix: dict[str, int], seed: int, repo_space: int):
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.random = random.Random(seed)
+        self.repo_space = repo_space
+        self.run_id = uuid.uuid4().hex[:8]
+        self.ids = []
+
+    def next_operation(self) -> str:
+        name = self.random.choices(self.names, self.weights)[0]
+        # Nothing to read or change yet: create something first.
+        if name in ("get", "update", "delete") and not self.ids:
+            return "create"
+        return name
+
+    def pick_id(self, remove: bool = False) -> int:
+        index = self.random.randrange(len(self.ids))
+        if remove:
+            self.ids[index], self.ids[-1] = self.ids[-1], self.ids[index]
+            return self.ids.pop()
+        return self.ids[index]
+
+    async def run(self, client: httpx.AsyncClient, name: str) -> int:
+        if name == "create":
+            n = self.random.randrange(self.repo_space)
+            response = await client.post(
+                "/repos", json={"owner": f"bench-{self.run_id}", "repo_name": f"repo-{n}"}
+            )
+            if response.status_code in (200, 201):
+                repo_id = response.json()["id"]
+                if repo_id not in self.ids:
+                    self.ids.append(repo_id)
+        elif name == "get":
+            response = await client.get(f"/repos/{self.pick_id()}")
+        elif name == "update":
+            response = await client.put(
+                f"/repos/{self.pick_id()}", params={"stars": self.random.randrange(100000)}
+            )
+        elif name == "delete":
+            response = await client.delete(f"/repos/{self.pick_id(remove=True)}")
+        else:
+            response = await client.get("/repos", params={"limit": 50, "sort": "stars"})
+        return response.status_code
+
+
+async def run_level(base_url: str, concurrency: int, requests: int, workload: Workload) -> dict:
+    latencies = {name: [] for name in workload.names}
+    latencies.setdefault("create", [])
+    errors = {}
+    remaining = requests
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            name = workload.next_operation()
+            start = time.perf_counter()
+            try:
+                status = await workload.run(client, name)
+            except httpx.HTTPError:
+                status = None
+            latencies[name].append(time.perf_counter() - start)
+            # A get/update/delete racing a concurrent delete may see 404.
+            if status is None or status >= 500 or (status >= 400 and status != 404):
+                errors[name] = errors.get(name, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    result = summarize({k: v for k, v in latencies.items() if v}, errors, elapsed)
+    result["concurrency"] = concurrency
+    return result
+
+
+def start_server(module: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env={**os.environ, **env},
+    )
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server for {url} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server for {url} did not start within {timeout}s")
+
+
+def print_report(result: dict):
+    print(
+        f"\nconcurrency {result['concurrency']}: {result['requests']} requests in "
+        f"{result['elapsed_s']:.2f}s, {result['throughput_rps']:.1f} req/s, {result['errors']} errors"
+    )
+    print(f"  {'operation':<10}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(result["operations"].items()) + [("all", result)]
+    for name, stats in rows:
+        print(
+            f"  {name:<10}{stats['requests']:>10}{stats['errors']:>8}"
+            f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+        )
+
+
+async def run_benchmark(base_url: str, args) -> list[dict]:
+    mix = parse_mix(args.mix)
+    results = []
+    for concurrency in args.concurrency:
+        # A fresh workload per level keeps each level reproducible on its own.
+        workload = Workload(mix, args.seed + concurrency, args.repo_space)
+        result = await run_level(base_url, concurrency, args.requests, workload)
+        print_report(result)
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tracker API against a local fake GitHub")
+    parser.add_argument("--concurrency", default="1,10,50",
+                        type=lambda value: [int(level) for level in value.split(",")],
+                        help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per concurrency level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--repo-space", type=int, default=500, help="distinct repos the creates draw from")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the request sequence")
+    parser.add_argument("--github-latency", type=float, default=0.05, help="fake GitHub latency in seconds")
+    parser.add_argument("--github-jitter", type=float, default=0.0, help="extra random fake GitHub latency")
+    parser.add_argument("--github-error-rate", type=float, default=0.0, help="share of fake GitHub 502s (0-1)")
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--github-port", type=int, default=9100)
+    parser.add_argument("--target", help="benchmark an already running app instead of starting one")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    processes = []
+    try:
+        if args.target:
+            base_url = args.target
+        else:
+            github_url = f"http://127.0.0.1:{args.github_port}"
+            base_url = f"http://127.0.0.1:{args.app_port}"
+            from bootstrap import bootstrap
+
+            bootstrap()
+            processes.append(start_server("fake_github:app", args.github_port, {
+                "FAKE_GITHUB_LATENCY": str(args.github_latency),
+                "FAKE_GITHUB_JITTER": str(args.github_jitter),
+                "FAKE_GITHUB_ERROR_RATE": str(args.github_error_rate),
+            }))
+            wait_ready(f"{github_url}/repos/octocat/hello-world", processes[-1])
+            processes.append(start_server("main:app", args.app_port, {
+                "GITHUB_API_URL": github_url,
+                "REFRESH_ENABLED": "false",
+            }))
+            wait_ready(f"{base_url}/repos?limit=1", processes[-1])
+
+        results = asyncio.run(run_benchmark(base_url, args))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Create or upgrade the database schema.
+
+Run once per deploy, before starting the app or any worker; the app itself
+no longer touches the schema when it is imported or started.
+
+    python bootstrap.py
+
+Missing tables are created with all their indexes. Tables created by older
+versions get the columns, indexes and constraints added since, so re-running
+it is always safe.
+"""
+import logging
+
+from sqlalchemy import inspect, text
+
+import models  # noqa: F401  (registers the tables on Base.metadata)
+from database import Base, get_engine
+
+logger = logging.getLogger(__name__)
+
+UPGRADES = [
+    "ALTER TABLE repositories ADD COLUMN IF NOT EXISTS fetched_at TIMESTAMPTZ NOT NULL DEFAULT now()",
+    "CREATE INDEX IF NOT EXISTS ix_repositories_stars_id ON repositories (stars, id)",
+    "CREATE INDEX IF NOT EXISTS ix_repositories_fetched_at ON repositories (fetched_at)",
+    "CREATE INDEX IF NOT EXISTS ix_repositories_owner_name_lower ON repositories (lower(owner), lower(name))",
+    "CREATE INDEX IF NOT EXISTS ix_repositories_owner_lower_stars_id ON repositories (lower(owner), stars, id)",
+    "CREATE INDEX IF NOT EXISTS ix_repositories_owner_lower_id ON repositories (lower(owner), id)",
+]
+UNIQUE_OWNER_NAME = (
+    "ALTER TABLE repositories ADD CONSTRAINT uq_repositories_owner_name UNIQUE (owner, name)"
+)
+
+
+def bootstrap(engine=None):
+    engine = engine or get_engine()
+    with engine.begin() as conn:
+        Base.metadata.create_all(bind=conn)
+        for statement in UPGRADES:
+            conn.execute(text(statement))
+        constraints = {c["name"] for c in inspect(conn).get_unique_constraints("repositories")}
+        if "uq_repositories_owner_name" not in constraints:
+            # Fails if duplicate (owner, name) rows exist; remove them first.
+            logger.info("Adding unique constraint on repositories (owner, name)")
+            conn.execute(text(UNIQUE_OWNER_NAME))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    bootstrap()
+    logger.info("Database schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
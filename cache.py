@@ -0,0 +1,146 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+
+REPO_CACHE_TTL = float(os.getenv("REPO_CACHE_TTL", "30"))
+REPO_CACHE_SIZE = int(os.getenv("REPO_CACHE_SIZE", "10000"))
+REPO_CACHE_URL = os.getenv("REPO_CACHE_URL")
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    # Per-process TTL + LRU store.
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self.errors = 0
+        self._entries = OrderedDict()
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def clear(self):
+        self._entries.clear()
+        self.evictions = 0
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    # Shared store so every worker sees the same entries and invalidations.
+    # Redis being down degrades to cache misses; requests fall through to
+    # the database instead of failing.
+    def __init__(self, url: str, ttl: float, prefix: str = "repo-cache:"):
+        import redis.asyncio as redis
+        from redis.exceptions import RedisError
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = 0
+        self.errors = 0
+        self._redis = redis.from_url(url)
+        self._error_types = RedisError
+
+    def _failed(self, operation: str, key: str, exc: Exception):
+        self.errors += 1
+        logger.warning("Redis %s of %s failed: %s", operation, self.prefix + key, exc)
+
+    async def get(self, key: str) -> bytes | None:
+        try:
+            return await self._redis.get(self.prefix + key)
+        except self._error_types as exc:
+            self._failed("get", key, exc)
+            return None
+
+    async def set(self, key: str, value: bytes):
+        if self.ttl > 0:
+            try:
+                await self._redis.set(self.prefix + key, value, px=int(self.ttl * 1000))
+            except self._error_types as exc:
+                self._failed("set", key, exc)
+
+    async def delete(self, key: str):
+        try:
+            await self._redis.delete(self.prefix + key)
+        except self._error_types as exc:
+            self._failed("delete", key, exc)
+
+    async def clear(self):
+        keys = [key async for key in self._redis.scan_iter(match=self.prefix + "*")]
+        if keys:
+            await self._redis.delete(*keys)
+
+    def size(self) -> int | None:
+        return None
+
+
+class RepoCache:
+    # Read-through cache of serialized RepoResponse bodies keyed by repo id.
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, repo_id: int) -> bytes | None:
+        value = await self.backend.get(str(repo_id))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, repo_id: int, value: bytes):
+        await self.backend.set(str(repo_id), value)
+
+    async def invalidate(self, *repo_ids: int):
+        for repo_id in repo_ids:
+            await self.backend.delete(str(repo_id))
+
+    async def clear(self):
+        await self.backend.clear()
+        self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.backend.evictions,
+            "errors": self.backend.errors,
+            "size": self.backend.size(),
+        }
+
+
+def create_backend():
+    if REPO_CACHE_URL:
+        return RedisBackend(REPO_CACHE_URL, REPO_CACHE_TTL)
+    return MemoryBackend(REPO_CACHE_SIZE, REPO_CACHE_TTL)
+
+
+repo_cache = RepoCache(create_backend())
@@ -0,0 +1,177 @@
+import base64
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Integer, String, any_, bindparam, column, delete, func, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from history import record_stars, star_history_insert
+from models import Repository
+
+REPO_FRESHNESS_SECONDS = float(os.getenv("REPO_FRESHNESS_SECONDS", "3600"))
+
+
+def repository_values(data: dict) -> dict:
+    return {
+        "name": data["name"],
+        "owner": data["owner"]["login"],
+        "stars": data["stargazers_count"],
+        "url": data["html_url"],
+    }
+
+
+def is_fresh(repo: Repository | None) -> bool:
+    if repo is None or repo.fetched_at is None:
+        return False
+    age = datetime.now(timezone.utc) - repo.fetched_at
+    return age < timedelta(seconds=REPO_FRESHNESS_SECONDS)
+
+
+async def get_repositories(db: AsyncSession, ids: list[int]) -> dict[int, Repository]:
+    # One "id = ANY($1)" round trip with the ids bound as a single array parameter.
+    if not ids:
+        return {}
+    repos = await db.scalars(
+        select(Repository).where(Repository.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+    )
+    return {repo.id: repo for repo in repos}
+
+
+async def update_stars(db: AsyncSession, stars_by_id: dict[int, int]) -> list[int]:
+    if not stars_by_id:
+        return []
+    incoming = values(column("id", Integer), column("stars", Integer), name="incoming").data(
+        list(stars_by_id.items())
+    )
+    return await _update_by_id(db, incoming, stars=incoming.c.stars)
+
+
+async def refresh_repositories(db: AsyncSession, rows_by_id: dict[int, dict]) -> list[int]:
+    # Writes re-fetched GitHub data back onto rows by id. Unlike an upsert, a
+    # row deleted while it was being fetched simply drops out instead of
+    # coming back under a new id.
+    if not rows_by_id:
+        return []
+    incoming = values(
+        column("id", Integer), column("stars", Integer), column("url", String), name="incoming"
+    ).data([(repo_id, row["stars"], row["url"]) for repo_id, row in rows_by_id.items()])
+    return await _update_by_id(
+        db, incoming, stars=incoming.c.stars, url=incoming.c.url, fetched_at=func.now()
+    )
+
+
+async def _update_by_id(db: AsyncSession, incoming, **assignments) -> list[int]:
+    # WITH updated AS (UPDATE ... FROM (VALUES ...) RETURNING id, stars),
+    # <star history writes> SELECT id FROM updated: every row and its history
+    # in one statement, and the returned ids tell us which ones exist.
+    updated = (
+        update(Repository)
+        .where(Repository.id == incoming.c.id)
+        .values(**assignments)
+        .returning(Repository.id.label("repo_id"), Repository.stars)
+        .cte("updated")
+    )
+    history = star_history_insert(updated).cte("history")
+    result = await db.execute(select(updated.c.repo_id).add_cte(history))
+    return list(result.scalars())
+
+
+async def delete_repository(db: AsyncSession, repo_id: int) -> bool:
+    deleted = await db.scalar(
+        delete(Repository).where(Repository.id == repo_id).returning(Repository.id)
+    )
+    return deleted is not None
+
+
+async def find_repositories(
+    db: AsyncSession, keys: list[tuple[str, str]]
+) -> dict[tuple[str, str], Repository]:
+    # GitHub owner and repo names are case-insensitive, so this matches on
+    # lower() (ix_repositories_owner_name_lower) and returns the rows under
+    # the keys as the caller spelled them.
+    if not keys:
+        return {}
+    lowered = {(owner.lower(), name.lower()) for owner, name in keys}
+    repos = await db.scalars(
+        select(Repository).where(
+            tuple_(func.lower(Repository.owner), func.lower(Repository.name)).in_(lowered)
+        )
+    )
+    by_lower = {(repo.owner.lower(), repo.name.lower()): repo for repo in repos}
+    return {
+        (owner, name): by_lower[(owner.lower(), name.lower())]
+        for owner, name in keys if (owner.lower(), name.lower()) in by_lower
+    }
+
+
+async def upsert_repositories(
+    db: AsyncSession, rows: list[dict]
+) -> dict[tuple[str, str], Repository]:
+    # One INSERT ... ON CONFLICT (owner, name) DO UPDATE ... RETURNING for all rows.
+    # Postgres rejects a statement that touches the same row twice, so the last
+    # row per key wins.
+    rows = list({(row["owner"], row["name"]): row for row in rows}.values())
+    if not rows:
+        return {}
+    stmt = insert(Repository)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_repositories_owner_name",
+        set_={"stars": stmt.excluded.stars, "url": stmt.excluded.url, "fetched_at": func.now()},
+    ).returning(Repository)
+    repos = list(await db.scalars(stmt, rows, execution_options={"populate_existing": True}))
+    await record_stars(db, [(repo.id, repo.stars) for repo in repos])
+    return {(repo.owner, repo.name): repo for repo in repos}
+
+
+def encode_cursor(repo: Repository, sort: str) -> str:
+    key = {"id": repo.id, "stars": repo.stars} if sort == "stars" else {"id": repo.id}
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str) -> dict:
+    # Raises ValueError for anything that is not a cursor we issued for this sort.
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        values = {"id": int(key["id"])}
+        if sort == "stars":
+            values["stars"] = int(key["stars"])
+        return values
+    except (ValueError, TypeError, KeyError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+async def list_repositories(
+    db: AsyncSession,
+    limit: int,
+    sort: str = "id",
+    cursor: str | None = None,
+    owner: str | None = None,
+    min_stars: int | None = None,
+) -> tuple[list[Repository], str | None]:
+    # Keyset pagination: each page seeks past the last row of the previous one
+    # on (stars, id) or id, so deep pages cost the same as the first.
+    query = select(Repository)
+    if owner is not None:
+        # Case-insensitive like find_repositories, since GitHub logins are.
+        query = query.where(func.lower(Repository.owner) == owner.lower())
+    if min_stars is not None:
+        query = query.where(Repository.stars >= min_stars)
+
+    after = decode_cursor(cursor, sort) if cursor else None
+    if sort == "stars":
+        if after:
+            query = query.where(
+                tuple_(Repository.stars, Repository.id) < tuple_(after["stars"], after["id"])
+            )
+        query = query.order_by(Repository.stars.desc(), Repository.id.desc())
+    else:
+        if after:
+            query = query.where(Repository.id > after["id"])
+        query = query.order_by(Repository.id)
+
+    repos = list(await db.scalars(query.limit(limit + 1)))
+    if len(repos) > limit:
+        return repos[:limit], encode_cursor(repos[limit - 1], sort)
+    return repos, None
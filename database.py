@@ -1,13 +1,94 @@
+import logging
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
+from metrics import TimedQueuePool, instrument_engine
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+# Every worker process gets its own pool, so the connection budget is split
+# across WEB_CONCURRENCY workers (set by serve.py) unless sizes are given.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "60"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+logger = logging.getLogger(__name__)
+
+
+def pool_sizes(max_connections: int = DB_MAX_CONNECTIONS, workers: int = WEB_CONCURRENCY) -> tuple[int, int]:
+    # Derived sizes keep workers * (pool_size + max_overflow) within
+    # max_connections; explicit DB_POOL_SIZE/DB_MAX_OVERFLOW only get a warning.
+    workers = max(workers, 1)
+    per_worker = max_connections // workers
+    if per_worker < 1:
+        raise ValueError(
+            f"DB_MAX_CONNECTIONS={max_connections} leaves no connection for each of {workers} workers"
+        )
+    pool_size = int(os.getenv("DB_POOL_SIZE", max(per_worker // 2, 1)))
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", max(per_worker - pool_size, 0)))
+    if workers * (pool_size + max_overflow) > max_connections:
+        logger.warning(
+            "%d workers with pool_size=%d and max_overflow=%d can open more than DB_MAX_CONNECTIONS=%d",
+            workers, pool_size, max_overflow, max_connections,
+        )
+    return pool_size, max_overflow
+
+
+DB_POOL_SIZE, DB_MAX_OVERFLOW = pool_sizes()
+
+# Engines are built on first use (the app's lifespan, or a script's main) so
+# importing this module never touches Postgres or loads a DB driver.
+SessionLocal = sessionmaker()
+AsyncSessionLocal = async_sessionmaker(expire_on_commit=False)
+_engine = None
+_async_engine = None
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = create_engine(
+            DATABASE_URL, echo=DB_ECHO, pool_pre_ping=DB_POOL_PRE_PING, pool_recycle=DB_POOL_RECYCLE
+        )
+        instrument_engine(_engine)
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        url = ASYNC_DATABASE_URL or make_url(DATABASE_URL).set(drivername="postgresql+asyncpg")
+        _async_engine = create_async_engine(
+            url,
+            echo=DB_ECHO,
+            poolclass=TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+        instrument_engine(_async_engine.sync_engine)
+        AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+async def dispose_async_engine():
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
 
-engine = create_engine(DATABASE_URL, echo=True)
-SessionLocal = sessionmaker(bind=engine)
 
 Base = declarative_base()
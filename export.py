@@ -0,0 +1,41 @@
+import csv
+import io
+import json
+import os
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Repository
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+EXPORT_COLUMNS = ("id", "name", "owner", "stars", "url", "fetched_at")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def encode_ndjson(rows) -> bytes:
+    return "".join(
+        json.dumps({**row._asdict(), "fetched_at": row.fetched_at.isoformat()}) + "\n" for row in rows
+    ).encode()
+
+
+def encode_csv(rows, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows((*row[:-1], row.fetched_at.isoformat()) for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def stream_repositories(db: AsyncSession, fmt: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+    # Reads through a server-side cursor chunk_size rows at a time and yields
+    # each chunk already encoded, so memory use does not grow with the table.
+    columns = [getattr(Repository, name) for name in EXPORT_COLUMNS]
+    result = await db.stream(
+        select(*columns).order_by(Repository.id).execution_options(yield_per=chunk_size)
+    )
+    if fmt == "csv":
+        yield encode_csv([], header=True)
+    async for rows in result.partitions():
+        yield encode_csv(rows) if fmt == "csv" else encode_ndjson(rows)
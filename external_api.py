@@ -1,8 +1,786 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
 import httpx
 
+from metrics import GITHUB_LATENCY
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", "5"))
+GITHUB_HTTP2 = os.getenv("GITHUB_HTTP2", "true").lower() in ("1", "true", "yes")
+GITHUB_MAX_CONNECTIONS = int(os.getenv("GITHUB_MAX_CONNECTIONS", "100"))
+GITHUB_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GITHUB_MAX_KEEPALIVE_CONNECTIONS", "20"))
+GITHUB_KEEPALIVE_EXPIRY = float(os.getenv("GITHUB_KEEPALIVE_EXPIRY", "30"))
+GITHUB_CACHE_SIZE = int(os.getenv("GITHUB_CACHE_SIZE", "10000"))
+# SQLite file shared by all workers on the host and kept across restarts;
+# empty disables the on-disk tier.
+GITHUB_DISK_CACHE_PATH = os.getenv("GITHUB_DISK_CACHE_PATH", "")
+GITHUB_DISK_CACHE_TTL = float(os.getenv("GITHUB_DISK_CACHE_TTL", "86400"))
+GITHUB_DISK_CACHE_MAX_ENTRIES = int(os.getenv("GITHUB_DISK_CACHE_MAX_ENTRIES", "100000"))
+# Comma separated; each token's quota is tracked and used separately.
+GITHUB_TOKENS = [
+    token.strip() for token in (os.getenv("GITHUB_TOKENS") or os.getenv("GITHUB_TOKEN") or "").split(",")
+    if token.strip()
+]
+# "auto" uses GraphQL for multi-repo fetches whenever a token is configured,
+# since GitHub's GraphQL API does not accept anonymous requests.
+GITHUB_GRAPHQL = os.getenv("GITHUB_GRAPHQL", "auto").lower()
+GITHUB_GRAPHQL_BATCH_SIZE = int(os.getenv("GITHUB_GRAPHQL_BATCH_SIZE", "100"))
+GITHUB_BREAKER_WINDOW = int(os.getenv("GITHUB_BREAKER_WINDOW", "20"))
+GITHUB_BREAKER_MIN_CALLS = int(os.getenv("GITHUB_BREAKER_MIN_CALLS", "10"))
+GITHUB_BREAKER_THRESHOLD = float(os.getenv("GITHUB_BREAKER_THRESHOLD", "0.5"))
+GITHUB_BREAKER_COOLDOWN = float(os.getenv("GITHUB_BREAKER_COOLDOWN", "30"))
+# Total time one fetch may take across hedges and retries.
+GITHUB_DEADLINE = float(os.getenv("GITHUB_DEADLINE", "5"))
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "2"))
+GITHUB_RETRY_BASE_DELAY = float(os.getenv("GITHUB_RETRY_BASE_DELAY", "0.1"))
+GITHUB_RETRY_MAX_DELAY = float(os.getenv("GITHUB_RETRY_MAX_DELAY", "2"))
+# Hedge after this percentile of recent latencies (0 disables hedging);
+# GITHUB_HEDGE_DELAY is used until enough latencies have been seen.
+GITHUB_HEDGE_PERCENTILE = float(os.getenv("GITHUB_HEDGE_PERCENTILE", "95"))
+GITHUB_HEDGE_DELAY = float(os.getenv("GITHUB_HEDGE_DELAY", "1"))
+GITHUB_HEDGE_MIN_DELAY = float(os.getenv("GITHUB_HEDGE_MIN_DELAY", "0.05"))
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# GitHub meters REST and GraphQL calls against separate budgets.
+QUOTA_RESOURCES = ("core", "graphql")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedResponse:
+    body: dict
+    etag: str | None = None
+    last_modified: str | None = None
+    fetched_at: float | None = None
+
+
+class ResponseCache:
+    # LRU of GitHub bodies plus their validators, used for conditional requests.
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> CachedResponse | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedResponse):
+        if self.max_size <= 0 or (entry.etag is None and entry.last_modified is None):
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+response_cache = ResponseCache(GITHUB_CACHE_SIZE)
+
+
+class DiskCache:
+    # Second tier under response_cache: a SQLite file in WAL mode, so every
+    # worker on the host reads and writes it concurrently and it survives
+    # restarts. Entries older than `ttl` are ignored and pruned, and the
+    # oldest go once there are more than `max_entries`. SQLite calls block, so
+    # they run in worker threads, each with its own connection. Failures are
+    # logged and treated as misses; the cache is never required.
+    def __init__(self, path: str, ttl: float = GITHUB_DISK_CACHE_TTL,
+                 max_entries: int = GITHUB_DISK_CACHE_MAX_ENTRIES, prune_every: int = 1000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._writes_since_prune = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.write_errors = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS github_responses ("
+                "key TEXT PRIMARY KEY, body TEXT NOT NULL, etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_github_responses_fetched_at ON github_responses (fetched_at)")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, key: str) -> CachedResponse | None:
+        row = self._connect().execute(
+            "SELECT body, etag, last_modified, fetched_at FROM github_responses WHERE key = ? AND fetched_at >= ?",
+            (key, time.time() - self.ttl),
+        ).fetchone()
+        return None if row is None else CachedResponse(json.loads(row[0]), row[1], row[2], row[3])
+
+    def _put(self, key: str, entry: CachedResponse) -> bool:
+        # Autocommit: once execute returns, the row is on disk.
+        self._connect().execute(
+            "INSERT INTO github_responses (key, body, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET body = excluded.body, etag = excluded.etag, "
+            "last_modified = excluded.last_modified, fetched_at = excluded.fetched_at",
+            (key, json.dumps(entry.body), entry.etag, entry.last_modified, entry.fetched_at or time.time()),
+        )
+        return True
+
+    def _touch(self, key: str):
+        self._connect().execute("UPDATE github_responses SET fetched_at = ? WHERE key = ?", (time.time(), key))
+
+    def _prune(self) -> int:
+        conn = self._connect()
+        expired = conn.execute("DELETE FROM github_responses WHERE fetched_at < ?", (time.time() - self.ttl,))
+        overflow = conn.execute(
+            "DELETE FROM github_responses WHERE key IN "
+            "(SELECT key FROM github_responses ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        return expired.rowcount + overflow.rowcount
+
+    async def _run(self, fn, *args):
+        try:
+            return await asyncio.to_thread(fn, *args)
+        except sqlite3.Error:
+            self.errors += 1
+            logger.warning("GitHub disk cache %s failed", fn.__name__, exc_info=True)
+            return None
+
+    async def get(self, key: str) -> CachedResponse | None:
+        entry = await self._run(self._get, key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    async def put(self, key: str, entry: CachedResponse):
+        if entry.etag is None and entry.last_modified is None:
+            return
+        if not await self._run(self._put, key, entry):
+            self.write_errors += 1
+            return
+        self.writes += 1
+        self._writes_since_prune += 1
+        if self._writes_since_prune >= self.prune_every:
+            self._writes_since_prune = 0
+            self.evictions += await self._run(self._prune) or 0
+
+    async def touch(self, key: str):
+        # A 304 re-validated the entry, so it counts as freshly fetched.
+        await self._run(self._touch, key)
+
+    async def prune(self):
+        self.evictions += await self._run(self._prune) or 0
+
+    def clear(self):
+        self._connect().execute("DELETE FROM github_responses")
+        self.hits = self.misses = self.writes = self.write_errors = self.evictions = self.errors = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "write_errors": self.write_errors,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+
+disk_cache = DiskCache(GITHUB_DISK_CACHE_PATH) if GITHUB_DISK_CACHE_PATH else None
+
+
+class RateLimit:
+    # Last quota GitHub reported through X-RateLimit-* headers for one
+    # resource: "core" (REST) or "graphql", which has its own points budget.
+    def __init__(self, resource: str = "core"):
+        self.resource = resource
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+
+    def update(self, headers: httpx.Headers):
+        if "X-RateLimit-Remaining" not in headers or headers.get("X-RateLimit-Resource", "core") != self.resource:
+            return
+        self.limit = int(headers.get("X-RateLimit-Limit", 0)) or self.limit
+        self.remaining = int(headers["X-RateLimit-Remaining"])
+        self.reset = float(headers.get("X-RateLimit-Reset", 0)) or self.reset
+
+    def headroom(self, now: float | None = None) -> float:
+        now = time.time() if now is None else now
+        if self.remaining is None or (self.reset is not None and now >= self.reset):
+            # Unknown or past its reset: assume the full quota is back.
+            return float(self.limit or 5000)
+        return float(self.remaining)
+
+
+class Credential:
+    def __init__(self, token: str | None):
+        self.token = token
+        self.quotas = {resource: RateLimit(resource) for resource in QUOTA_RESOURCES}
+        self.requests = 0
+
+    @property
+    def quota(self) -> RateLimit:
+        return self.quotas["core"]
+
+    def update(self, headers: httpx.Headers):
+        for quota in self.quotas.values():
+            quota.update(headers)
+
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+
+class CredentialPool:
+    # Sends each request with the token that has the most quota left. Tokens
+    # that ran out sit out until their reset; when all have, requests go out
+    # anonymously. Quotas are tracked per resource (REST and GraphQL) from
+    # each token's own X-RateLimit-* headers, and are decremented on checkout
+    # so concurrent requests spread out. remaining/reset/limit aggregate the
+    # tokens' REST quota for the refresher's pacing.
+    def __init__(self, tokens: list[str]):
+        self.tokens = [Credential(token) for token in tokens]
+        self.anonymous = Credential(None)
+        self.anonymous_fallbacks = 0
+
+    def _members(self) -> list[Credential]:
+        return self.tokens or [self.anonymous]
+
+    def available(self, now: float | None = None, resource: str = "core") -> list[Credential]:
+        return [credential for credential in self.tokens if credential.quotas[resource].headroom(now) > 0]
+
+    def acquire(self, resource: str = "core") -> Credential:
+        available = self.available(resource=resource)
+        if not available:
+            if self.tokens:
+                self.anonymous_fallbacks += 1
+            credential = self.anonymous
+        else:
+            credential = max(available, key=lambda credential: credential.quotas[resource].headroom())
+        quota = credential.quotas[resource]
+        if quota.remaining is not None and quota.remaining > 0:
+            quota.remaining -= 1
+        credential.requests += 1
+        return credential
+
+    @property
+    def remaining(self) -> int | None:
+        known = [c.quota for c in self._members() if c.quota.remaining is not None]
+        if not known:
+            return None
+        return int(sum(c.quota.headroom() for c in self._members()))
+
+    @property
+    def reset(self) -> float | None:
+        resets = [c.quota.reset for c in self._members() if c.quota.reset is not None]
+        return max(resets) if resets else None
+
+    @property
+    def limit(self) -> int | None:
+        limits = [c.quota.limit for c in self._members() if c.quota.limit is not None]
+        return sum(limits) if limits else None
+
+    def stats(self) -> dict:
+        return {
+            "tokens": len(self.tokens),
+            "available": len(self.available()) if self.tokens else None,
+            "remaining": self.remaining,
+            "graphql_available": len(self.available(resource="graphql")) if self.tokens else None,
+            "anonymous_fallbacks": self.anonymous_fallbacks,
+        }
+
+
+credentials = CredentialPool(GITHUB_TOKENS)
+
+
+class GitHubError(Exception):
+    # A per-repo failure inside an otherwise successful GraphQL response.
+    pass
+
+
+class GraphQLError(Exception):
+    # A GraphQL response that failed as a whole (an error without a path, such
+    # as RATE_LIMITED, or "data": null). Transient, unlike GitHubError.
+    pass
+
+
+class CircuitOpenError(Exception):
+    # Raised instead of calling GitHub while the circuit breaker is open.
+    pass
+
+
+class CircuitBreaker:
+    # Opens when at least `threshold` of the last `window` calls failed, then
+    # rejects calls for `cooldown` seconds. After that a single probe call is
+    # let through: success closes the breaker, failure opens it again. A probe
+    # that never reports back (cancelled) is replaced after another cooldown.
+    def __init__(self, window: int = GITHUB_BREAKER_WINDOW, min_calls: int = GITHUB_BREAKER_MIN_CALLS,
+                 threshold: float = GITHUB_BREAKER_THRESHOLD, cooldown: float = GITHUB_BREAKER_COOLDOWN):
+        self.min_calls = min_calls
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.outcomes = deque(maxlen=window)
+        self.opened_at = None
+        self.probe_started = None
+        self.opens = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(self.opened_at + self.cooldown - time.monotonic(), 0.0)
+
+    def before_call(self):
+        state = self.state
+        probing = self.probe_started is not None and time.monotonic() - self.probe_started < self.cooldown
+        if state == "open" or (state == "half_open" and probing):
+            self.rejected += 1
+            raise CircuitOpenError("GitHub circuit breaker is open")
+        if state == "half_open":
+            self.probe_started = time.monotonic()
+
+    def record(self, success: bool):
+        if self.opened_at is not None:
+            if self.probe_started is None:
+                # Finished after the breaker opened; the probe decides.
+                return
+            self.probe_started = None
+            self.opened_at = None if success else time.monotonic()
+            if not success:
+                self.opens += 1
+            self.outcomes.clear()
+            return
+        self.outcomes.append(success)
+        failures = self.outcomes.count(False)
+        if len(self.outcomes) >= self.min_calls and failures >= self.threshold * len(self.outcomes):
+            self.opened_at = time.monotonic()
+            self.opens += 1
+
+    def reset(self):
+        self.outcomes.clear()
+        self.opened_at = None
+        self.probe_started = None
+
+    def stats(self) -> dict:
+        return {
+            "open": 0 if self.state == "closed" else 1,
+            "opens": self.opens,
+            "rejected": self.rejected,
+            "recent_failures": self.outcomes.count(False),
+        }
+
+
+breaker = CircuitBreaker()
+
+
+class LatencyWindow:
+    # Rolling window of recent upstream latencies, used to pick the hedge delay.
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> float | None:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+latencies = LatencyWindow()
+
+
+def hedge_delay() -> float | None:
+    if GITHUB_HEDGE_PERCENTILE <= 0:
+        return None
+    delay = latencies.percentile(GITHUB_HEDGE_PERCENTILE)
+    return max(GITHUB_HEDGE_DELAY if delay is None else delay, GITHUB_HEDGE_MIN_DELAY)
+
+
+def retry_delay(attempt: int, response: httpx.Response | None = None) -> float:
+    # Capped exponential backoff with full jitter; a Retry-After header is a floor.
+    delay = random.uniform(0, min(GITHUB_RETRY_MAX_DELAY, GITHUB_RETRY_BASE_DELAY * 2 ** attempt))
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, float(retry_after))
+    return delay
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    # Timeouts, connection errors, 5xx and throttling count against GitHub's
+    # health; a 404 for a repo that does not exist does not.
+    if isinstance(exc, GraphQLError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500 or exc.response.status_code in (403, 429)
+    return isinstance(exc, httpx.HTTPError)
+
+
+def is_transient_failure(exc: BaseException) -> bool:
+    # Worth trying again later: the breaker was open or GitHub itself failed.
+    # Anything else (404, a per-repo GraphQL error) will fail the same way.
+    return isinstance(exc, CircuitOpenError) or is_upstream_failure(exc)
+
+
+_client = None
+_stats = {
+    "requests_total": 0, "requests_in_flight": 0, "errors_total": 0, "coalesced_total": 0,
+    "hedges_total": 0, "retries_total": 0,
+}
+_inflight = {}
+
+
+def create_client(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=GITHUB_API_URL,
+        http2=GITHUB_HTTP2,
+        timeout=GITHUB_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=GITHUB_MAX_CONNECTIONS,
+            max_keepalive_connections=GITHUB_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=GITHUB_KEEPALIVE_EXPIRY,
+        ),
+        headers={"Accept": "application/vnd.github+json"},
+        transport=transport,
+    )
+
+
+async def start_client(transport: httpx.AsyncBaseTransport | None = None):
+    global _client
+    if _client is None:
+        _client = create_client(transport)
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    # Lifespan normally opens the client; fall back lazily for scripts and tests.
+    global _client
+    if _client is None:
+        _client = create_client()
+    return _client
+
+
+def pool_stats() -> dict:
+    stats = dict(_stats)
+    pool = getattr(getattr(_client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    stats["connections_open"] = len(connections)
+    stats["connections_idle"] = sum(1 for conn in connections if conn.is_idle())
+    return stats
+
+
+def quota_resource(url: str) -> str:
+    return "graphql" if url == "/graphql" else "core"
+
+
+def is_rate_limited(response: httpx.Response) -> bool:
+    return response.status_code in (403, 429) and response.headers.get("X-RateLimit-Remaining") == "0"
+
+
+async def _attempt(client: httpx.AsyncClient, method: str, url: str, timeout: float, **kwargs) -> httpx.Response:
+    credential = credentials.acquire(quota_resource(url))
+    kwargs["headers"] = {**(kwargs.get("headers") or {}), **credential.headers()}
+    start = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(client.request(method, url, **kwargs), timeout)
+    except (httpx.HTTPError, asyncio.TimeoutError) as exc:
+        GITHUB_LATENCY.labels("error").observe(time.perf_counter() - start)
+        if isinstance(exc, asyncio.TimeoutError):
+            raise httpx.TimeoutException(f"GitHub did not answer within {timeout:.2f}s") from exc
+        raise
+    elapsed = time.perf_counter() - start
+    GITHUB_LATENCY.labels(str(response.status_code)).observe(elapsed)
+    if response.status_code not in RETRYABLE_STATUSES:
+        latencies.add(elapsed)
+    credential.update(response.headers)
+    return response
+
+
+def _discard(task: asyncio.Task):
+    task.cancel()
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+
+async def _hedged(client: httpx.AsyncClient, method: str, url: str, timeout: float, **kwargs) -> httpx.Response:
+    # If the first attempt has not answered within the hedge delay, a second
+    # one races it and the first usable answer wins.
+    first = asyncio.ensure_future(_attempt(client, method, url, timeout, **kwargs))
+    delay = hedge_delay()
+    if delay is None or delay >= timeout:
+        return await first
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+
+    _stats["hedges_total"] += 1
+    second = asyncio.ensure_future(_attempt(client, method, url, timeout - delay, **kwargs))
+    pending = {first, second}
+    outcome = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None and task.result().status_code not in RETRYABLE_STATUSES:
+                    return task.result()
+                outcome = task
+        return outcome.result()
+    finally:
+        for task in pending:
+            _discard(task)
+
+
+async def _request(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+    # Hedged attempts plus jittered retries for transport errors and
+    # retryable statuses, all within GITHUB_DEADLINE.
+    deadline = time.monotonic() + GITHUB_DEADLINE
+    attempt = 0
+    while True:
+        timeout = min(GITHUB_TIMEOUT, deadline - time.monotonic())
+        response = error = None
+        try:
+            response = await _hedged(client, method, url, timeout, **kwargs)
+        except httpx.TransportError as exc:
+            error = exc
+        rate_limited = error is None and is_rate_limited(response)
+        if error is None and response.status_code not in RETRYABLE_STATUSES and not rate_limited:
+            return response
+
+        if rate_limited:
+            # The token that ran out is benched by its headers; switch to another one straight away.
+            if not credentials.available(resource=quota_resource(url)):
+                return response
+            delay = 0.0
+        else:
+            delay = retry_delay(attempt, response)
+        if attempt >= GITHUB_MAX_RETRIES or time.monotonic() + delay >= deadline:
+            if error is not None:
+                raise error
+            return response
+        _stats["retries_total"] += 1
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
 async def fetch_github_repo(owner: str, repo: str):
-    url = f"https://api.github.com/repos/{owner}/{repo}"
-    async with httpx.AsyncClient(timeout=5) as client:
-        response = await client.get(url)
+    # Single-flight: concurrent callers for the same repo share one upstream
+    # request and its result or error.
+    key = f"{owner}/{repo}".lower()
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_github_repo(owner, repo))
+        _inflight[key] = task
+        task.add_done_callback(lambda done: _finish_inflight(key, done))
+    else:
+        _stats["coalesced_total"] += 1
+    # Shielded so one caller being cancelled does not cancel the shared fetch.
+    return await asyncio.shield(task)
+
+
+def _finish_inflight(key: str, task: asyncio.Future):
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    if not task.cancelled():
+        task.exception()
+
+
+async def _fetch_github_repo(owner: str, repo: str):
+    client = get_client()
+    breaker.before_call()
+    _stats["requests_total"] += 1
+    _stats["requests_in_flight"] += 1
+    try:
+        key = f"{owner}/{repo}".lower()
+        cached = response_cache.get(key)
+        if cached is None and disk_cache is not None:
+            cached = await disk_cache.get(key)
+            if cached is not None:
+                response_cache.put(key, cached)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        response = await _request(client, "GET", f"/repos/{owner}/{repo}", headers=headers)
+        if response.status_code == 304 and cached is not None:
+            breaker.record(True)
+            response_cache.hits += 1
+            cached.fetched_at = time.time()
+            if disk_cache is not None:
+                await disk_cache.touch(key)
+            return cached.body
+
         response.raise_for_status()
-        return response.json()
+        response_cache.misses += 1
+        body = response.json()
+        entry = CachedResponse(
+            body=body,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            fetched_at=time.time(),
+        )
+        response_cache.put(key, entry)
+        if disk_cache is not None:
+            await disk_cache.put(key, entry)
+        breaker.record(True)
+        return body
+    except Exception as exc:
+        _stats["errors_total"] += 1
+        breaker.record(not is_upstream_failure(exc))
+        raise
+    finally:
+        _stats["requests_in_flight"] -= 1
+
+
+def graphql_enabled() -> bool:
+    if GITHUB_GRAPHQL == "auto":
+        return bool(credentials.tokens)
+    return GITHUB_GRAPHQL in ("1", "true", "yes")
+
+
+def build_repos_query(keys: list[tuple[str, str]]) -> tuple[str, dict]:
+    # One aliased repository() field per repo; names go in variables, never in the query text.
+    params, fields, variables = [], [], {}
+    for i, (owner, repo) in enumerate(keys):
+        params.append(f"$o{i}: String!, $n{i}: String!")
+        fields.append(f"r{i}: repository(owner: $o{i}, name: $n{i}) {{ name owner {{ login }} stargazerCount url }}")
+        variables[f"o{i}"] = owner
+        variables[f"n{i}"] = repo
+    return f"query({', '.join(params)}) {{ {' '.join(fields)} }}", variables
+
+
+def repo_from_graphql(node: dict) -> dict:
+    # Same shape as the REST /repos/{owner}/{repo} body.
+    return {
+        "name": node["name"],
+        "owner": {"login": node["owner"]["login"]},
+        "stargazers_count": node["stargazerCount"],
+        "html_url": node["url"],
+    }
+
+
+async def _fetch_graphql_batch(keys: list[tuple[str, str]]) -> list[dict | Exception]:
+    client = get_client()
+    breaker.before_call()
+    _stats["requests_total"] += 1
+    _stats["requests_in_flight"] += 1
+    try:
+        query, variables = build_repos_query(keys)
+        response = await _request(client, "POST", "/graphql", json={"query": query, "variables": variables})
+        response.raise_for_status()
+        payload = response.json()
+        errors = payload.get("errors") or []
+        unplaced = [error for error in errors if not error.get("path")]
+        if payload.get("data") is None or unplaced:
+            # GitHub reports rate limiting and other request-wide failures as
+            # HTTP 200 with errors that belong to no repo.
+            error = (unplaced or errors or [{}])[0]
+            raise GraphQLError(error.get("type") or error.get("message") or "GraphQL request failed")
+        breaker.record(True)
+    except Exception as exc:
+        _stats["errors_total"] += 1
+        breaker.record(not is_upstream_failure(exc))
+        raise
+    finally:
+        _stats["requests_in_flight"] -= 1
+
+    data = payload["data"]
+    errors = {error["path"][0]: error.get("message", "GitHub API failed") for error in errors}
+    results = []
+    for i in range(len(keys)):
+        node = data.get(f"r{i}")
+        if node is None:
+            results.append(GitHubError(errors.get(f"r{i}") or "Repository not found"))
+        else:
+            results.append(repo_from_graphql(node))
+    return results
+
+
+async def fetch_github_repos(keys, concurrency: int = 10, fetch=None) -> dict:
+    # Fetches many repos, returning {(owner, repo): body or the exception it
+    # failed with}. With GraphQL enabled every GITHUB_GRAPHQL_BATCH_SIZE repos
+    # cost one request; otherwise each goes through `fetch` (fetch_github_repo).
+    keys = list(dict.fromkeys(keys))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    if graphql_enabled():
+        async def fetch_chunk(chunk):
+            async with semaphore:
+                try:
+                    return await _fetch_graphql_batch(chunk)
+                except Exception as exc:
+                    return [exc] * len(chunk)
+
+        chunks = [keys[i:i + GITHUB_GRAPHQL_BATCH_SIZE] for i in range(0, len(keys), GITHUB_GRAPHQL_BATCH_SIZE)]
+        results = [result for chunk in await asyncio.gather(*map(fetch_chunk, chunks)) for result in chunk]
+    else:
+        fetch = fetch or fetch_github_repo
+
+        async def fetch_one(owner: str, repo: str):
+            async with semaphore:
+                try:
+                    return await fetch(owner, repo)
+                except Exception as exc:
+                    return exc
+
+        results = await asyncio.gather(*(fetch_one(owner, repo) for owner, repo in keys))
+    return dict(zip(keys, results))
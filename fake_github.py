@@ -0,0 +1,108 @@
+"""
+Local stand-in for the parts of the GitHub REST API the tracker uses.
+
+Serve it with `uvicorn fake_github:app --port 9000` and point the tracker at it
+with GITHUB_API_URL=http://127.0.0.1:9000, or mount it in-process with
+httpx.ASGITransport(app=create_app()). FAKE_GITHUB_LATENCY (seconds),
+FAKE_GITHUB_JITTER (seconds) and FAKE_GITHUB_ERROR_RATE (0-1) shape the
+served app's responses for load tests.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import zlib
+
+from fastapi import FastAPI, Request, Response
+
+
+REPOSITORY_FIELD = re.compile(r"(\w+): repository\(owner: \$(\w+), name: \$(\w+)\)")
+
+
+def default_stars(owner: str, repo: str) -> int:
+    return zlib.crc32(f"{owner}/{repo}".encode()) % 100000
+
+
+def create_app(latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Fake GitHub")
+    app.state.repos = {}
+    app.state.requests = 0
+    app.state.not_modified = 0
+    app.state.errors = 0
+    app.state.graphql_requests = 0
+
+    async def simulate_upstream() -> Response | None:
+        if latency or jitter:
+            await asyncio.sleep(latency + random.uniform(0, jitter))
+        if error_rate and random.random() < error_rate:
+            app.state.errors += 1
+            return Response(status_code=502, content=b'{"message":"Server Error"}', media_type="application/json")
+        return None
+
+    def stars_for(owner: str, repo: str) -> int | None:
+        return app.state.repos.get(f"{owner}/{repo}".lower(), default_stars(owner, repo))
+
+    @app.get("/repos/{owner}/{repo}")
+    async def get_repo(owner: str, repo: str, request: Request):
+        app.state.requests += 1
+        if (error := await simulate_upstream()) is not None:
+            return error
+        stars = stars_for(owner, repo)
+        if stars is None:
+            return Response(status_code=404, content=b'{"message":"Not Found"}', media_type="application/json")
+
+        body = json.dumps({
+            "name": repo,
+            "owner": {"login": owner},
+            "stargazers_count": stars,
+            "html_url": f"https://github.com/{owner}/{repo}",
+        }).encode()
+        etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+        if request.headers.get("if-none-match") == etag:
+            app.state.not_modified += 1
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+    @app.post("/graphql")
+    async def graphql(request: Request):
+        # Understands the aliased repository() queries external_api builds.
+        app.state.graphql_requests += 1
+        if (error := await simulate_upstream()) is not None:
+            return error
+        payload = await request.json()
+        variables = payload.get("variables") or {}
+        data, errors = {}, []
+        for alias, owner_var, name_var in REPOSITORY_FIELD.findall(payload["query"]):
+            owner, repo = variables[owner_var], variables[name_var]
+            stars = stars_for(owner, repo)
+            if stars is None:
+                data[alias] = None
+                errors.append({
+                    "type": "NOT_FOUND",
+                    "path": [alias],
+                    "message": f"Could not resolve to a Repository with the name '{owner}/{repo}'.",
+                })
+            else:
+                data[alias] = {
+                    "name": repo,
+                    "owner": {"login": owner},
+                    "stargazerCount": stars,
+                    "url": f"https://github.com/{owner}/{repo}",
+                }
+        return {"data": data, "errors": errors} if errors else {"data": data}
+
+    return app
+
+
+def set_stars(app: FastAPI, owner: str, repo: str, stars: int | None):
+    """Pin a repo's star count; None makes the repo return 404."""
+    app.state.repos[f"{owner}/{repo}".lower()] = stars
+
+
+app = create_app(
+    latency=float(os.getenv("FAKE_GITHUB_LATENCY", "0")),
+    jitter=float(os.getenv("FAKE_GITHUB_JITTER", "0")),
+    error_rate=float(os.getenv("FAKE_GITHUB_ERROR_RATE", "0")),
+)
@@ -0,0 +1,100 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Integer, String, column, delete, func, literal, select, true, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import StarRollup, StarSnapshot
+
+RESOLUTIONS = ("hour", "day")
+HISTORY_SNAPSHOT_RETENTION_DAYS = int(os.getenv("HISTORY_SNAPSHOT_RETENTION_DAYS", "30"))
+HISTORY_HOURLY_RETENTION_DAYS = int(os.getenv("HISTORY_HOURLY_RETENTION_DAYS", "90"))
+
+
+async def record_stars(db: AsyncSession, points: list[tuple[int, int]]):
+    # Appends a snapshot for every (repo_id, stars) that differs from the repo's
+    # latest snapshot and folds the new snapshots into the hourly and daily
+    # rollups, all in one statement. Unchanged values write nothing.
+    points = list(dict(points).items())
+    if not points:
+        return
+    incoming = values(column("repo_id", Integer), column("stars", Integer), name="incoming").data(points)
+    await db.execute(star_history_insert(incoming))
+
+
+def star_history_insert(incoming):
+    # The record_stars statement for any selectable with repo_id and stars
+    # columns, such as the RETURNING of an UPDATE wrapped in a CTE, so the
+    # history write can ride along in the same statement as the change.
+    latest = (
+        select(StarSnapshot.stars)
+        .where(StarSnapshot.repo_id == incoming.c.repo_id)
+        .order_by(StarSnapshot.recorded_at.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    snapshot = insert(StarSnapshot).from_select(
+        ["repo_id", "stars"],
+        select(incoming.c.repo_id, incoming.c.stars).where(incoming.c.stars.is_distinct_from(latest)),
+    )
+    inserted = (
+        snapshot.on_conflict_do_update(
+            index_elements=["repo_id", "recorded_at"], set_={"stars": snapshot.excluded.stars}
+        )
+        .returning(StarSnapshot.repo_id, StarSnapshot.stars, StarSnapshot.recorded_at)
+        .cte("inserted")
+    )
+    resolutions = values(column("resolution", String), name="resolutions").data(
+        [(resolution,) for resolution in RESOLUTIONS]
+    )
+    bucket = func.timezone(
+        "UTC", func.date_trunc(resolutions.c.resolution, func.timezone("UTC", inserted.c.recorded_at))
+    )
+
+    stmt = insert(StarRollup).from_select(
+        ["repo_id", "resolution", "bucket", "min_stars", "max_stars", "last_stars", "samples"],
+        select(
+            inserted.c.repo_id,
+            resolutions.c.resolution,
+            bucket,
+            inserted.c.stars,
+            inserted.c.stars,
+            inserted.c.stars,
+            literal(1),
+        ).select_from(inserted.join(resolutions, true())),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["repo_id", "resolution", "bucket"],
+        set_={
+            "min_stars": func.least(StarRollup.min_stars, stmt.excluded.min_stars),
+            "max_stars": func.greatest(StarRollup.max_stars, stmt.excluded.max_stars),
+            "last_stars": stmt.excluded.last_stars,
+            "samples": StarRollup.samples + 1,
+        },
+    )
+    return stmt
+
+
+async def read_rollups(
+    db: AsyncSession, repo_id: int, resolution: str, start: datetime | None, end: datetime | None
+) -> list[StarRollup]:
+    query = select(StarRollup).where(StarRollup.repo_id == repo_id, StarRollup.resolution == resolution)
+    if start is not None:
+        query = query.where(StarRollup.bucket >= start)
+    if end is not None:
+        query = query.where(StarRollup.bucket < end)
+    return list(await db.scalars(query.order_by(StarRollup.bucket)))
+
+
+async def prune_history(db: AsyncSession):
+    # Raw snapshots and hourly rollups age out; daily rollups are kept, so
+    # storage grows by at most one row per repo per day.
+    now = datetime.now(timezone.utc)
+    await db.execute(delete(StarSnapshot).where(
+        StarSnapshot.recorded_at < now - timedelta(days=HISTORY_SNAPSHOT_RETENTION_DAYS)
+    ))
+    await db.execute(delete(StarRollup).where(
+        StarRollup.resolution == "hour",
+        StarRollup.bucket < now - timedelta(days=HISTORY_HOURLY_RETENTION_DAYS),
+    ))
@@ -0,0 +1,175 @@
+"""
+Bulk import of owner/repo lists.
+
+Reads a JSONL file of {"owner": ..., "repo_name": ...} records line by line,
+fetches them from GitHub with bounded concurrency (batched GraphQL queries when
+a token is configured) and upserts each batch in a single multi-row statement. Progress is checkpointed after every committed
+batch, so re-running the same command resumes where it stopped. Records that
+fail because GitHub is down (or the circuit breaker is open) are retried
+before the checkpoint moves past them; if GitHub stays down the import stops
+and a re-run picks up from the same batch.
+
+    python import_repos.py repos.jsonl --concurrency 20 --batch-size 500
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from pydantic import ValidationError
+
+import external_api
+from crud import find_repositories, is_fresh, repository_values, upsert_repositories
+from database import AsyncSessionLocal, dispose_async_engine, get_async_engine
+from schemas import RepoCreate
+
+IMPORT_RETRY_DELAY = float(os.getenv("IMPORT_RETRY_DELAY", "5"))
+IMPORT_MAX_RETRIES = int(os.getenv("IMPORT_MAX_RETRIES", "10"))
+
+logger = logging.getLogger(__name__)
+
+
+def read_checkpoint(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"offset": 0, "lines": 0, "imported": 0, "skipped": 0, "failed": 0}
+
+
+def write_checkpoint(path: str, checkpoint: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def read_batches(path: str, offset: int, batch_size: int):
+    # Yields (records, offset after the batch); invalid lines come back as None.
+    with open(path, "rb") as f:
+        f.seek(offset)
+        batch = []
+        for line in f:
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                batch.append(RepoCreate.model_validate_json(line))
+            except ValidationError:
+                logger.warning("Skipping invalid line at byte %d", offset - len(line))
+                batch.append(None)
+            if len(batch) >= batch_size:
+                yield batch, offset
+                batch = []
+        if batch:
+            yield batch, offset
+
+
+async def import_batch(
+    db, records: list[RepoCreate], fetch=None, concurrency: int = 20
+) -> tuple[dict, list[RepoCreate]]:
+    # Returns the counts and the records to try again later. Only invalid
+    # lines and permanent fetch errors (404 and the like) count as failed.
+    valid = [record for record in records if record is not None]
+    tracked = await find_repositories(db, [(record.owner, record.repo_name) for record in valid])
+    pending = [(record.owner, record.repo_name) for record in valid
+               if not is_fresh(tracked.get((record.owner, record.repo_name)))]
+
+    results = await external_api.fetch_github_repos(pending, concurrency, fetch)
+    fetched, transient = [], set()
+    for (owner, repo), data in results.items():
+        if isinstance(data, Exception):
+            logger.warning("Fetch of %s/%s failed: %s", owner, repo, data)
+            if external_api.is_transient_failure(data):
+                transient.add((owner, repo))
+        else:
+            fetched.append(repository_values(data))
+    await upsert_repositories(db, fetched)
+    await db.commit()
+
+    retry = [record for record in valid if (record.owner, record.repo_name) in transient]
+    imported = sum(1 for key in pending if not isinstance(results[key], Exception))
+    counts = {
+        "imported": imported,
+        "skipped": len(valid) - len(pending),
+        "failed": len(records) - len(valid) - len(retry) + len(pending) - imported,
+    }
+    return counts, retry
+
+
+async def import_file(
+    path: str,
+    checkpoint_path: str | None = None,
+    concurrency: int = 20,
+    batch_size: int = 500,
+    session_factory=AsyncSessionLocal,
+    fetch=None,
+    retry_delay: float = IMPORT_RETRY_DELAY,
+    max_retries: int = IMPORT_MAX_RETRIES,
+) -> dict:
+    checkpoint_path = checkpoint_path or f"{path}.checkpoint"
+    checkpoint = read_checkpoint(checkpoint_path)
+    started = time.perf_counter()
+
+    for records, offset in read_batches(path, checkpoint["offset"], batch_size):
+        lines = len(records)
+        totals = dict.fromkeys(("imported", "skipped", "failed"), 0)
+        for attempt in range(max_retries + 1):
+            if attempt:
+                # Wait out an open breaker rather than burning retries on it.
+                await asyncio.sleep(max(external_api.breaker.retry_after(), retry_delay))
+            async with session_factory() as db:
+                counts, records = await import_batch(db, records, fetch, concurrency)
+            for key, value in counts.items():
+                totals[key] += value
+            if not records:
+                break
+        else:
+            # Rows stored so far are fresh and get skipped when the batch is re-run.
+            raise RuntimeError(
+                f"GitHub is unavailable, {len(records)} records left; stopped at byte {checkpoint['offset']}"
+            )
+        checkpoint["offset"] = offset
+        checkpoint["lines"] += lines
+        for key, value in totals.items():
+            checkpoint[key] += value
+        write_checkpoint(checkpoint_path, checkpoint)
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "%d lines done (%d imported, %d skipped, %d failed), %.1f lines/s",
+            checkpoint["lines"], checkpoint["imported"], checkpoint["skipped"], checkpoint["failed"],
+            checkpoint["lines"] / elapsed if elapsed else 0.0,
+        )
+    return checkpoint
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Bulk import owner/repo records from a JSONL file")
+    parser.add_argument("path", help="JSONL file with one {\"owner\", \"repo_name\"} record per line")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent GitHub fetches")
+    parser.add_argument("--batch-size", type=int, default=500, help="records per insert and checkpoint")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <path>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="ignore any existing checkpoint")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    checkpoint_path = args.checkpoint or f"{args.path}.checkpoint"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    get_async_engine()
+    await external_api.start_client()
+    try:
+        result = await import_file(
+            args.path, checkpoint_path, concurrency=args.concurrency, batch_size=args.batch_size
+        )
+    finally:
+        await external_api.close_client()
+        await dispose_async_engine()
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,73 +1,383 @@
-import uvicorn
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
+import time
 
-from database import engine, SessionLocal, Base
+# Measured from the first line of main so worker cold start can be tracked.
+IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime
+from typing import Literal
+
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, get_async_engine, dispose_async_engine
 from models import Repository
-from schemas import RepoCreate, RepoResponse
-from external_api import fetch_github_repo
+from schemas import (
+    RepoCreate, RepoResponse, RepoBatchResult, RepoBatchResponse, RepoPage, StarHistory,
+    RepoLookupRequest, RepoLookupResponse, RepoStarsUpdate, RepoStarsUpdateResponse,
+)
+from crud import (
+    repository_values, is_fresh, get_repositories, find_repositories, upsert_repositories, refresh_repositories,
+    list_repositories, update_stars, delete_repository,
+)
+from cache import repo_cache
+from history import read_rollups
+from export import MEDIA_TYPES, stream_repositories
+import external_api
+import metrics
+import profiling
+from external_api import fetch_github_repo, fetch_github_repos, start_client, close_client
+from refresher import StarRefresher, REFRESH_ENABLED
+from write_behind import star_buffer
 
 
-Base.metadata.create_all(bind=engine)
+BATCH_FETCH_CONCURRENCY = int(os.getenv("BATCH_FETCH_CONCURRENCY", "10"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+LOOKUP_MAX_IDS = int(os.getenv("LOOKUP_MAX_IDS", "1000"))
+BULK_UPDATE_MAX_ITEMS = int(os.getenv("BULK_UPDATE_MAX_ITEMS", "5000"))
+# How long POST /repos waits on GitHub when a stored row could be served instead.
+STALE_FETCH_TIMEOUT = float(os.getenv("STALE_FETCH_TIMEOUT", "1"))
 
-app = FastAPI(title="GitHub Repository Tracker")
+logger = logging.getLogger(__name__)
+_revalidations = {}
 
-def get_db():
-    db = SessionLocal()
-    try:
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The schema is created by bootstrap.py, not here; the engine only
+    # connects when the first request needs it.
+    started = time.perf_counter()
+    async_engine = get_async_engine()
+    if profiling.DEBUG_PROFILING:
+        profiling.count_statements(async_engine.sync_engine)
+    await start_client()
+    refresh_task = asyncio.create_task(StarRefresher().run()) if REFRESH_ENABLED else None
+    if star_buffer is not None:
+        star_buffer.start()
+    startup_duration = time.perf_counter() - started
+    metrics.STARTUP_DURATION.labels("import").set(IMPORT_DURATION)
+    metrics.STARTUP_DURATION.labels("lifespan").set(startup_duration)
+    logger.info("Worker ready: import %.3fs, startup %.3fs", IMPORT_DURATION, startup_duration)
+    yield
+    if star_buffer is not None:
+        await star_buffer.stop()
+    if refresh_task is not None:
+        refresh_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await refresh_task
+    for task in list(_revalidations.values()):
+        task.cancel()
+    await asyncio.gather(*_revalidations.values(), return_exceptions=True)
+    await close_client()
+    await dispose_async_engine()
+
+
+app = FastAPI(title="GitHub Repository Tracker", lifespan=lifespan)
+
+metrics.stats_collector.register(
+    "db_pool", lambda: metrics.db_pool_stats(get_async_engine().pool), "Database connection pool state"
+)
+metrics.stats_collector.register(
+    "github_client", external_api.pool_stats, "GitHub HTTP client counters and connections",
+    counters=("requests_total", "errors_total", "coalesced_total", "hedges_total", "retries_total"),
+)
+metrics.stats_collector.register(
+    "github_response_cache", external_api.response_cache.stats, "GitHub conditional request cache",
+    counters=("hits", "misses", "evictions"),
+)
+metrics.stats_collector.register(
+    "github_credentials", external_api.credentials.stats, "GitHub token pool quota",
+    counters=("anonymous_fallbacks",),
+)
+metrics.stats_collector.register(
+    "github_breaker", external_api.breaker.stats, "GitHub circuit breaker state",
+    counters=("opens", "rejected"),
+)
+if external_api.disk_cache is not None:
+    metrics.stats_collector.register(
+        "github_disk_cache", external_api.disk_cache.stats, "GitHub on-disk response cache",
+        counters=("hits", "misses", "writes", "write_errors", "evictions", "errors"),
+    )
+metrics.stats_collector.register(
+    "repo_cache", repo_cache.stats, "GET /repos/{repo_id} response cache",
+    counters=("hits", "misses", "evictions", "errors"),
+)
+if star_buffer is not None:
+    metrics.stats_collector.register(
+        "star_write_buffer", star_buffer.stats, "Write-behind star buffer",
+        counters=("coalesced", "flushes", "written"),
+    )
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.REQUEST_LATENCY.labels(
+        request.method, route.path if route else "unmatched", str(response.status_code)
+    ).observe(time.perf_counter() - start)
+    return response
+
+
+if profiling.DEBUG_PROFILING:
+    app.middleware("http")(profiling.profile_request)
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def revalidate_repo(repo_id: int, owner: str, repo_name: str):
+    # Waits out an open circuit breaker, then refreshes the stored row by id,
+    # so a repo deleted in the meantime is not re-inserted.
+    await asyncio.sleep(external_api.breaker.retry_after())
+    try:
+        data = await fetch_github_repo(owner, repo_name)
+        async with AsyncSessionLocal() as db:
+            refreshed = await refresh_repositories(db, {repo_id: repository_values(data)})
+            if star_buffer is not None:
+                star_buffer.discard(*refreshed)
+            await db.commit()
+        await repo_cache.invalidate(*refreshed)
+    except Exception:
+        logger.warning("Revalidation of %s/%s failed", owner, repo_name, exc_info=True)
+
+
+def schedule_revalidation(repo_id: int, owner: str, repo_name: str):
+    if repo_id not in _revalidations:
+        task = asyncio.create_task(revalidate_repo(repo_id, owner, repo_name))
+        _revalidations[repo_id] = task
+        task.add_done_callback(lambda _: _revalidations.pop(repo_id, None))
 
 @app.post("/repos", response_model=RepoResponse, status_code=201)
-async def create_repo(payload: RepoCreate, db: Session = Depends(get_db)):
+async def create_repo(payload: RepoCreate, response: Response, db: AsyncSession = Depends(get_db)):
+    key = (payload.owner, payload.repo_name)
+    tracked = await find_repositories(db, [key])
+    stored = tracked.get(key)
+    if is_fresh(stored):
+        response.status_code = 200
+        return stored
+
     try:
-        data = await fetch_github_repo(payload.owner, payload.repo_name)
+        if stored is None:
+            data = await fetch_github_repo(payload.owner, payload.repo_name)
+        else:
+            # The fetch is shielded, so on timeout it keeps going and the
+            # revalidation below picks up its result.
+            data = await asyncio.wait_for(fetch_github_repo(payload.owner, payload.repo_name), STALE_FETCH_TIMEOUT)
     except Exception:
-        raise HTTPException(status_code=502, detail="GitHub API failed")
+        if stored is None:
+            raise HTTPException(status_code=502, detail="GitHub API failed")
+        # Stale-while-revalidate: serve the last stored data and refresh it in the background.
+        metrics.STALE_RESPONSES.inc()
+        schedule_revalidation(stored.id, payload.owner, payload.repo_name)
+        response.status_code = 200
+        response.headers["Warning"] = '110 - "Response is Stale"'
+        return stored
+
+    row = repository_values(data)
+    repos = await upsert_repositories(db, [row])
+    if star_buffer is not None:
+        star_buffer.discard(*(repo.id for repo in repos.values()))
+    await db.commit()
+    await repo_cache.invalidate(*(repo.id for repo in repos.values()))
+    return repos[(row["owner"], row["name"])]
+
 
-    repo = Repository(
-        name=data["name"],
-        owner=data["owner"]["login"],
-        stars=data["stargazers_count"],
-        url=data["html_url"]
+@app.post("/repos/batch", response_model=RepoBatchResponse)
+async def create_repos_batch(payload: list[RepoCreate], db: AsyncSession = Depends(get_db)):
+    if len(payload) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+
+    tracked = await find_repositories(db, [(item.owner, item.repo_name) for item in payload])
+    pending = [(item.owner, item.repo_name) for item in payload
+               if not is_fresh(tracked.get((item.owner, item.repo_name)))]
+    fetched = await fetch_github_repos(pending, BATCH_FETCH_CONCURRENCY, fetch=fetch_github_repo)
+    rows = {key: None if isinstance(data, Exception) else repository_values(data) for key, data in fetched.items()}
+    upserted = await upsert_repositories(db, [row for row in rows.values() if row is not None])
+    if star_buffer is not None:
+        star_buffer.discard(*(repo.id for repo in upserted.values()))
+    await db.commit()
+    await repo_cache.invalidate(*(repo.id for repo in upserted.values()))
+
+    results = []
+    for item in payload:
+        key = (item.owner, item.repo_name)
+        stale = False
+        if key not in rows:
+            repo = tracked[key]
+        elif rows[key] is None and key in tracked:
+            # Stale-while-revalidate, as in POST /repos: serve the stored row
+            # and refresh it in the background.
+            repo, stale = tracked[key], True
+            metrics.STALE_RESPONSES.inc()
+            schedule_revalidation(repo.id, item.owner, item.repo_name)
+        elif rows[key] is None:
+            results.append(RepoBatchResult(
+                owner=item.owner, repo_name=item.repo_name, ok=False, error="GitHub API failed"
+            ))
+            continue
+        else:
+            repo = upserted[(rows[key]["owner"], rows[key]["name"])]
+        results.append(RepoBatchResult(
+            owner=item.owner, repo_name=item.repo_name, ok=True, stale=stale,
+            repo=RepoResponse.model_validate(repo),
+        ))
+
+    created = sum(result.ok for result in results)
+    return RepoBatchResponse(created=created, failed=len(results) - created, results=results)
+
+
+@app.get("/repos", response_model=RepoPage)
+async def list_repos(
+    owner: str | None = None,
+    min_stars: int | None = None,
+    sort: Literal["id", "stars"] = "id",
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        repos, next_cursor = await list_repositories(
+            db, limit, sort=sort, cursor=cursor, owner=owner, min_stars=min_stars
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return RepoPage(items=repos, next_cursor=next_cursor)
+
+
+async def lookup_repositories(ids: list[int], db: AsyncSession) -> RepoLookupResponse:
+    if len(ids) > LOOKUP_MAX_IDS:
+        raise HTTPException(status_code=413, detail=f"Lookup exceeds {LOOKUP_MAX_IDS} ids")
+    ids = list(dict.fromkeys(ids))
+    repos = await get_repositories(db, ids)
+    items = [RepoResponse.model_validate(repos[repo_id]) for repo_id in ids if repo_id in repos]
+    if star_buffer is not None:
+        for item in items:
+            pending = star_buffer.get(item.id)
+            if pending is not None:
+                item.stars = pending
+    return RepoLookupResponse(
+        items=items,
+        missing=[repo_id for repo_id in ids if repo_id not in repos],
     )
 
-    db.add(repo)
-    db.commit()
-    db.refresh(repo)
-    return repo
+
+@app.get("/repos/lookup", response_model=RepoLookupResponse)
+async def lookup_repos(ids: list[int] = Query(...), db: AsyncSession = Depends(get_db)):
+    return await lookup_repositories(ids, db)
+
+
+@app.post("/repos/lookup", response_model=RepoLookupResponse)
+async def lookup_repos_by_body(payload: RepoLookupRequest, db: AsyncSession = Depends(get_db)):
+    return await lookup_repositories(payload.ids, db)
+
+
+@app.get("/repos/export")
+async def export_repos(format: Literal["ndjson", "csv"] = "ndjson", db: AsyncSession = Depends(get_db)):
+    return StreamingResponse(
+        stream_repositories(db, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="repositories.{format}"'},
+    )
 
 
 @app.get("/repos/{repo_id}", response_model=RepoResponse)
-def get_repo(repo_id: int, db: Session = Depends(get_db)):
-    repo = db.query(Repository).filter(Repository.id == repo_id).first()
-    if not repo:
+async def get_repo(repo_id: int, db: AsyncSession = Depends(get_db)):
+    body = await repo_cache.get(repo_id)
+    if body is None:
+        repo = await db.get(Repository, repo_id)
+        if not repo:
+            raise HTTPException(status_code=404, detail="Repository not found")
+        body = RepoResponse.model_validate(repo).model_dump_json().encode()
+        await repo_cache.set(repo_id, body)
+
+    pending = star_buffer.get(repo_id) if star_buffer is not None else None
+    if pending is not None:
+        body = json.dumps(json.loads(body) | {"stars": pending}).encode()
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/repos/{repo_id}/history", response_model=StarHistory)
+async def get_repo_history(
+    repo_id: int,
+    start: datetime | None = Query(None, alias="from"),
+    end: datetime | None = Query(None, alias="to"),
+    resolution: Literal["hour", "day"] = "day",
+    db: AsyncSession = Depends(get_db),
+):
+    if await db.get(Repository, repo_id) is None:
         raise HTTPException(status_code=404, detail="Repository not found")
-    return repo
+    points = await read_rollups(db, repo_id, resolution, start, end)
+    return StarHistory(repo_id=repo_id, resolution=resolution, points=points)
+
+
+@app.patch("/repos", response_model=RepoStarsUpdateResponse)
+async def update_repos_stars(payload: list[RepoStarsUpdate], db: AsyncSession = Depends(get_db)):
+    if len(payload) > BULK_UPDATE_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Update exceeds {BULK_UPDATE_MAX_ITEMS} items")
+
+    stars_by_id = {item.id: item.stars for item in payload}
+    if star_buffer is not None:
+        star_buffer.discard(*stars_by_id)
+    updated = await update_stars(db, stars_by_id)
+    await db.commit()
+    await repo_cache.invalidate(*updated)
+
+    updated_ids = set(updated)
+    return RepoStarsUpdateResponse(
+        updated=len(updated),
+        missing=[repo_id for repo_id in stars_by_id if repo_id not in updated_ids],
+    )
 
 
 @app.put("/repos/{repo_id}")
-def update_repo(repo_id: int, stars: int, db: Session = Depends(get_db)):
-    repo = db.query(Repository).filter(Repository.id == repo_id).first()
-    if not repo:
+async def update_repo(repo_id: int, stars: int, db: AsyncSession = Depends(get_db)):
+    if star_buffer is not None:
+        if repo_id not in star_buffer and await db.scalar(
+            select(Repository.id).where(Repository.id == repo_id)
+        ) is None:
+            raise HTTPException(status_code=404, detail="Repository not found")
+        await star_buffer.put(repo_id, stars)
+        return {"message": "Stars updated"}
+
+    if not await update_stars(db, {repo_id: stars}):
         raise HTTPException(status_code=404, detail="Repository not found")
 
-    repo.stars = stars
-    db.commit()
+    await db.commit()
+    await repo_cache.invalidate(repo_id)
     return {"message": "Stars updated"}
 
 
 @app.delete("/repos/{repo_id}", status_code=204)
-def delete_repo(repo_id: int, db: Session = Depends(get_db)):
-    repo = db.query(Repository).filter(Repository.id == repo_id).first()
-    if not repo:
+async def delete_repo(repo_id: int, db: AsyncSession = Depends(get_db)):
+    if star_buffer is not None:
+        star_buffer.discard(repo_id)
+    if not await delete_repository(db, repo_id):
         raise HTTPException(status_code=404, detail="Repository not found")
 
-    db.delete(repo)
-    db.commit()
+    await db.commit()
+    await repo_cache.invalidate(repo_id)
 
 
 
+IMPORT_DURATION = time.perf_counter() - IMPORT_STARTED
+
+
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
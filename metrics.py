@@ -0,0 +1,115 @@
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+registry = CollectorRegistry()
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route", "status"], registry=registry,
+)
+DB_STATEMENT_LATENCY = Histogram(
+    "db_statement_duration_seconds", "SQL statement latency by operation",
+    ["operation"], registry=registry,
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_STATEMENTS = Counter(
+    "db_statements_total", "SQL statements executed by operation",
+    ["operation"], registry=registry,
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection",
+    registry=registry,
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+GITHUB_LATENCY = Histogram(
+    "github_request_duration_seconds", "GitHub API request latency by response status",
+    ["status"], registry=registry,
+)
+STALE_RESPONSES = Counter(
+    "stale_responses_total", "Stored repos served because GitHub was unavailable or slow",
+    registry=registry,
+)
+STARTUP_DURATION = Gauge(
+    "app_startup_duration_seconds", "Worker cold start time: importing main and running the lifespan startup",
+    ["phase"], registry=registry,
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK"}
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # Records how long each checkout waited for a free connection.
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+def statement_operation(statement: str) -> str:
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return operation if operation in OPERATIONS else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    operation = statement_operation(statement)
+    DB_STATEMENT_LATENCY.labels(operation).observe(elapsed)
+    DB_STATEMENTS.labels(operation).inc()
+
+
+def instrument_engine(engine):
+    # Accepts a sync Engine; pass AsyncEngine.sync_engine for async engines.
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def db_pool_stats(pool) -> dict:
+    if not hasattr(pool, "checkedout"):
+        return {}
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "saturation": pool.checkedout() / capacity if capacity else 0.0,
+    }
+
+
+class StatsCollector:
+    # Publishes the stats() dicts kept by other modules at scrape time. Keys
+    # listed in `counters` only ever grow and are exposed as counters (with a
+    # _total suffix); the rest are point-in-time values exposed as gauges.
+    def __init__(self):
+        self.sources = {}
+
+    def register(self, prefix: str, stats, documentation: str, counters: tuple[str, ...] = ()):
+        self.sources[prefix] = (stats, documentation, frozenset(counters))
+
+    def collect(self):
+        for prefix, (stats, documentation, counters) in self.sources.items():
+            for key, value in stats().items():
+                if value is None:
+                    continue
+                if key in counters:
+                    yield CounterMetricFamily(f"{prefix}_{key}", documentation, value=value)
+                else:
+                    yield GaugeMetricFamily(f"{prefix}_{key}", documentation, value=value)
+
+
+stats_collector = StatsCollector()
+registry.register(stats_collector)
+
+
+def render() -> bytes:
+    return generate_latest(registry)
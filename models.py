@@ -1,11 +1,47 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import (
+    Column, DateTime, ForeignKey, Integer, String, Index, UniqueConstraint, func
+)
 from database import Base
 
 class Repository(Base):
     __tablename__ = "repositories"
+    __table_args__ = (
+        UniqueConstraint("owner", "name", name="uq_repositories_owner_name"),
+        Index("ix_repositories_stars_id", "stars", "id"),
+        Index("ix_repositories_fetched_at", "fetched_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     owner = Column(String, nullable=False)
     stars = Column(Integer, nullable=False)
     url = Column(String, nullable=False)
+    fetched_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+# Backs the case-insensitive (owner, name) lookups in crud.find_repositories.
+Index("ix_repositories_owner_name_lower", func.lower(Repository.owner), func.lower(Repository.name))
+# Back the owner-filtered listing in crud.list_repositories, for both sorts.
+Index("ix_repositories_owner_lower_stars_id", func.lower(Repository.owner), Repository.stars, Repository.id)
+Index("ix_repositories_owner_lower_id", func.lower(Repository.owner), Repository.id)
+
+
+class StarSnapshot(Base):
+    # Raw star history: one row per observed change, never per unchanged poll.
+    __tablename__ = "star_snapshots"
+
+    repo_id = Column(Integer, ForeignKey("repositories.id", ondelete="CASCADE"), primary_key=True)
+    recorded_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    stars = Column(Integer, nullable=False)
+
+
+class StarRollup(Base):
+    __tablename__ = "star_rollups"
+
+    repo_id = Column(Integer, ForeignKey("repositories.id", ondelete="CASCADE"), primary_key=True)
+    resolution = Column(String(4), primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    min_stars = Column(Integer, nullable=False)
+    max_stars = Column(Integer, nullable=False)
+    last_stars = Column(Integer, nullable=False)
+    samples = Column(Integer, nullable=False)
@@ -0,0 +1,78 @@
+"""
+Opt-in request profiling and SQL statement budgets.
+
+With DEBUG_PROFILING enabled, every request counts the SQL statements it
+issues and is flagged when it goes over SQL_STATEMENT_BUDGET (the usual sign
+of an N+1 query). Sending the X-Debug-Profile header additionally runs the
+request under cProfile and writes the report to PROFILE_DIR. cProfile sees
+the whole event loop thread, so concurrent requests show up in the report.
+"""
+import logging
+import os
+import tempfile
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+DEBUG_PROFILING = os.getenv("DEBUG_PROFILING", "false").lower() in ("1", "true", "yes")
+PROFILE_HEADER = "X-Debug-Profile"
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "github-tracker-profiles"))
+SQL_STATEMENT_BUDGET = int(os.getenv("SQL_STATEMENT_BUDGET", "20"))
+
+logger = logging.getLogger(__name__)
+
+_statements: ContextVar[Counter | None] = ContextVar("sql_statements", default=None)
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    statements = _statements.get()
+    if statements is not None:
+        statements[statement] += 1
+
+
+def count_statements(engine):
+    if not event.contains(engine, "before_cursor_execute", _record_statement):
+        event.listen(engine, "before_cursor_execute", _record_statement)
+
+
+def write_report(profiler, request) -> str:
+    import pstats
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{int(time.time() * 1000)}-{request.method}-{request.url.path.strip('/').replace('/', '_') or 'root'}.txt"
+    path = os.path.join(PROFILE_DIR, name)
+    with open(path, "w") as f:
+        pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(50)
+    return name
+
+
+async def profile_request(request, call_next):
+    statements = Counter()
+    token = _statements.set(statements)
+    profiler = None
+    if request.headers.get(PROFILE_HEADER):
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        response = await call_next(request)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        _statements.reset(token)
+
+    total = sum(statements.values())
+    response.headers["X-SQL-Statements"] = str(total)
+    if total > SQL_STATEMENT_BUDGET:
+        statement, repeats = statements.most_common(1)[0]
+        response.headers["X-SQL-Budget-Exceeded"] = "true"
+        logger.warning(
+            "%s %s issued %d SQL statements (budget %d); most repeated (%dx): %s",
+            request.method, request.url.path, total, SQL_STATEMENT_BUDGET, repeats, statement,
+        )
+    if profiler is not None:
+        response.headers["X-Profile-Report"] = write_report(profiler, request)
+    return response
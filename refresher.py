@@ -0,0 +1,176 @@
+"""
+Background star refresher.
+
+Runs inside the app lifespan when REFRESH_ENABLED is set, or standalone as a
+worker with `python refresher.py`.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update, func
+
+import external_api
+import write_behind
+from cache import repo_cache
+from crud import repository_values, refresh_repositories, REPO_FRESHNESS_SECONDS
+from database import AsyncSessionLocal, dispose_async_engine, get_async_engine
+from history import prune_history
+from models import Repository
+
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "false").lower() in ("1", "true", "yes")
+REFRESH_BATCH_SIZE = int(os.getenv("REFRESH_BATCH_SIZE", "100"))
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", "5"))
+REFRESH_IDLE_SECONDS = float(os.getenv("REFRESH_IDLE_SECONDS", "60"))
+REFRESH_QUOTA_RESERVE = int(os.getenv("REFRESH_QUOTA_RESERVE", "500"))
+REFRESH_DEFAULT_RATE = float(os.getenv("REFRESH_DEFAULT_RATE", "1"))
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    # Paces refresh requests so that the quota left after REFRESH_QUOTA_RESERVE
+    # is spread evenly until GitHub's reset time. The reserve keeps headroom
+    # for interactive POST /repos calls.
+    def __init__(self, rate_limit: external_api.CredentialPool | external_api.RateLimit, reserve: int, capacity: int,
+                 default_rate: float = REFRESH_DEFAULT_RATE):
+        self.rate_limit = rate_limit
+        self.reserve = reserve
+        self.capacity = capacity
+        self.default_rate = default_rate
+        self.tokens = 1.0
+        self.updated_at = time.monotonic()
+
+    def rate(self, now: float | None = None) -> float:
+        if self.rate_limit.remaining is None or self.rate_limit.reset is None:
+            return self.default_rate
+        now = time.time() if now is None else now
+        budget = self.rate_limit.remaining - self.reserve
+        if budget <= 0:
+            return 0.0
+        return budget / max(self.rate_limit.reset - now, 1.0)
+
+    def delay(self) -> float:
+        # Seconds to wait before the next token, or 0 if one was taken.
+        now = time.monotonic()
+        rate = self.rate()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        if rate <= 0:
+            return max(self.rate_limit.reset - time.time(), 1.0)
+        return (1 - self.tokens) / rate
+
+    async def acquire(self):
+        while (wait := self.delay()) > 0:
+            await asyncio.sleep(wait)
+
+
+class StarRefresher:
+    def __init__(self, session_factory=AsyncSessionLocal, fetch=None, bucket: TokenBucket | None = None,
+                 batch_size: int = REFRESH_BATCH_SIZE, concurrency: int = REFRESH_CONCURRENCY,
+                 min_age: float = REPO_FRESHNESS_SECONDS):
+        self.session_factory = session_factory
+        self.fetch = fetch or external_api.fetch_github_repo
+        self.bucket = bucket or TokenBucket(external_api.credentials, REFRESH_QUOTA_RESERVE, concurrency)
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.min_age = min_age
+        self.refreshed = 0
+        self.failed = 0
+        self.deferred = 0
+
+    async def refresh_batch(self) -> int:
+        # Stalest first by the hour, so that within an hour of staleness the
+        # most starred repos go first instead of the order they were fetched.
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.min_age)
+        async with self.session_factory() as db:
+            due = (await db.execute(
+                select(Repository.id, Repository.owner, Repository.name)
+                .where(Repository.fetched_at < cutoff)
+                .order_by(func.date_trunc("hour", Repository.fetched_at), Repository.stars.desc(), Repository.id)
+                .limit(self.batch_size)
+            )).all()
+        if not due:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(owner: str, name: str):
+            async with semaphore:
+                if external_api.breaker.retry_after() > 0:
+                    # GitHub is down: leave the rest of the batch for later.
+                    return external_api.CircuitOpenError("GitHub circuit breaker is open")
+                await self.bucket.acquire()
+                try:
+                    return repository_values(await self.fetch(owner, name))
+                except Exception as exc:
+                    logger.warning("Refresh of %s/%s failed", owner, name, exc_info=True)
+                    return exc
+
+        results = await asyncio.gather(*(fetch(owner, name) for _, owner, name in due))
+        rows = {repo_id: result for (repo_id, _, _), result in zip(due, results)
+                if not isinstance(result, Exception)}
+        failed_ids = [repo_id for (repo_id, _, _), result in zip(due, results)
+                      if isinstance(result, Exception) and not external_api.is_transient_failure(result)]
+        deferred = sum(1 for result in results if external_api.is_transient_failure(result))
+
+        async with self.session_factory() as db:
+            # By id, so repos deleted during the fetch are not re-inserted.
+            refreshed = await refresh_repositories(db, rows)
+            if write_behind.star_buffer is not None:
+                write_behind.star_buffer.discard(*refreshed)
+            if failed_ids:
+                # Push permanent failures to the back of the queue rather than
+                # retrying them forever. Transient ones keep their place.
+                await db.execute(
+                    update(Repository).where(Repository.id.in_(failed_ids)).values(fetched_at=func.now())
+                )
+            await db.commit()
+
+        await repo_cache.invalidate(*(repo_id for repo_id, _, _ in due))
+        self.refreshed += len(refreshed)
+        self.failed += len(failed_ids)
+        self.deferred += deferred
+        return len(due)
+
+    async def run(self):
+        while True:
+            try:
+                refreshed = await self.refresh_batch()
+            except Exception:
+                logger.exception("Star refresh batch failed")
+                refreshed = 0
+            if (wait := external_api.breaker.retry_after()) > 0:
+                await asyncio.sleep(wait)
+                continue
+            if refreshed < self.batch_size:
+                await self.prune()
+                await asyncio.sleep(REFRESH_IDLE_SECONDS)
+
+    async def prune(self):
+        try:
+            async with self.session_factory() as db:
+                await prune_history(db)
+                await db.commit()
+        except Exception:
+            logger.exception("Star history pruning failed")
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO)
+    get_async_engine()
+    await external_api.start_client()
+    try:
+        await StarRefresher().run()
+    finally:
+        await external_api.close_client()
+        await dispose_async_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
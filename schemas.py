@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from pydantic import BaseModel, HttpUrl, ConfigDict
 
 class RepoCreate(BaseModel):
@@ -12,3 +14,50 @@ class RepoResponse(BaseModel):
     owner: str
     stars: int
     url: HttpUrl
+
+
+class RepoBatchResult(BaseModel):
+    owner: str
+    repo_name: str
+    ok: bool
+    # Served from the database because GitHub failed; a refresh is scheduled.
+    stale: bool = False
+    repo: RepoResponse | None = None
+    error: str | None = None
+
+class RepoBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[RepoBatchResult]
+
+class RepoStarsUpdate(BaseModel):
+    id: int
+    stars: int
+
+class RepoStarsUpdateResponse(BaseModel):
+    updated: int
+    missing: list[int]
+
+class RepoLookupRequest(BaseModel):
+    ids: list[int]
+
+class RepoLookupResponse(BaseModel):
+    items: list[RepoResponse]
+    missing: list[int]
+
+class RepoPage(BaseModel):
+    items: list[RepoResponse]
+    next_cursor: str | None = None
+
+class StarHistoryPoint(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    bucket: datetime
+    min_stars: int
+    max_stars: int
+    last_stars: int
+
+class StarHistory(BaseModel):
+    repo_id: int
+    resolution: str
+    points: list[StarHistoryPoint]
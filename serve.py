@@ -0,0 +1,66 @@
+"""
+Production server entry point.
+
+Runs the app under uvicorn with one worker process per core, uvloop and
+httptools when they are installed, and no auto-reload. `python main.py`
+remains the single-process development server.
+
+    python serve.py
+    WEB_CONCURRENCY=4 PORT=8080 python serve.py
+
+Settings (environment): HOST, PORT, WEB_CONCURRENCY (workers, default: CPU
+count), KEEPALIVE_TIMEOUT (seconds), BACKLOG, LIMIT_CONCURRENCY (per worker)
+and FORWARDED_ALLOW_IPS. Each worker sizes its database pool from
+DB_MAX_CONNECTIONS / WEB_CONCURRENCY (see database.py). REFRESH_ENABLED is
+refused with more than one worker; run `python refresher.py` alongside.
+"""
+import importlib.util
+import os
+
+import uvicorn
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1)
+KEEPALIVE_TIMEOUT = int(os.getenv("KEEPALIVE_TIMEOUT", "30"))
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+LIMIT_CONCURRENCY = int(os.getenv("LIMIT_CONCURRENCY", "0")) or None
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+
+def server_options() -> dict:
+    return {
+        "host": HOST,
+        "port": PORT,
+        "workers": WEB_CONCURRENCY,
+        "loop": "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+        "timeout_keep_alive": KEEPALIVE_TIMEOUT,
+        "backlog": BACKLOG,
+        "limit_concurrency": LIMIT_CONCURRENCY,
+        "proxy_headers": True,
+        "forwarded_allow_ips": FORWARDED_ALLOW_IPS,
+        "access_log": False,
+    }
+
+
+def main():
+    from database import DB_MAX_CONNECTIONS, pool_sizes
+    from refresher import REFRESH_ENABLED
+
+    # Fail here rather than in every worker if the budget cannot be split.
+    pool_sizes(DB_MAX_CONNECTIONS, WEB_CONCURRENCY)
+    if REFRESH_ENABLED and WEB_CONCURRENCY > 1:
+        # Each worker would run its own refresher over the same stale rows.
+        raise SystemExit(
+            f"REFRESH_ENABLED would start {WEB_CONCURRENCY} refreshers; "
+            "unset it and run `python refresher.py` as a single separate worker"
+        )
+    # Workers are spawned processes and inherit the environment, so this is
+    # how each of them learns how many pools share the connection budget.
+    os.environ["WEB_CONCURRENCY"] = str(WEB_CONCURRENCY)
+    uvicorn.run("main:app", **server_options())
+
+
+if __name__ == "__main__":
+    main()
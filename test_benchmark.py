@@ -0,0 +1,70 @@
+"""
+Test Suite for the Benchmark Harness
+Tests benchmark.py helpers and the fake GitHub latency/error settings
+"""
+import httpx
+import pytest
+
+import fake_github
+from benchmark import Workload, parse_mix, percentile, summarize
+
+
+def test_parse_mix():
+    """Test that operation weights are parsed and validated"""
+    assert parse_mix("create=20,get=80") == {"create": 20, "get": 80}
+    with pytest.raises(ValueError):
+        parse_mix("create=20,fetch=80")
+    with pytest.raises(ValueError):
+        parse_mix("get=0")
+
+
+def test_percentile_nearest_rank():
+    """Test nearest-rank percentiles over sorted samples"""
+    samples = [float(n) for n in range(1, 101)]
+    assert percentile(samples, 50) == 50.0
+    assert percentile(samples, 99) == 99.0
+    assert percentile(samples, 100) == 100.0
+    assert percentile([], 50) == 0.0
+
+
+def test_summarize_reports_throughput():
+    """Test per-operation and overall latency summaries"""
+    result = summarize({"get": [0.002, 0.001], "list": [0.004]}, {"list": 1}, elapsed=0.5)
+    assert result["requests"] == 3
+    assert result["errors"] == 1
+    assert result["throughput_rps"] == 6.0
+    assert result["operations"]["get"]["p50_ms"] == 1.0
+    assert result["p99_ms"] == 4.0
+
+
+def test_workload_is_reproducible():
+    """Test that the same seed yields the same operation sequence"""
+    def sequence():
+        workload = Workload({"create": 1, "get": 1, "list": 1}, seed=7, repo_space=10)
+        workload.ids = [1, 2, 3]
+        return [workload.next_operation() for _ in range(20)]
+
+    assert sequence() == sequence()
+
+
+def test_workload_creates_before_reading():
+    """Test that reads are turned into creates until an id exists"""
+    workload = Workload({"get": 1}, seed=1, repo_space=10)
+    assert workload.next_operation() == "create"
+
+
+@pytest.mark.asyncio
+async def test_fake_github_error_rate():
+    """Test that the fake GitHub server injects server errors"""
+    app = fake_github.create_app(error_rate=1.0)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://github") as client:
+        response = await client.get("/repos/octocat/Hello-World")
+    assert response.status_code == 502
+    assert app.state.errors == 1
+
+
+def test_workload_owner_is_unique_per_run():
+    """Test that runs with the same seed create repos under different owners"""
+    first = Workload({"create": 1}, seed=7, repo_space=10)
+    second = Workload({"create": 1}, seed=7, repo_space=10)
+    assert first.run_id != second.run_id
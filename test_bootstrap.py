@@ -0,0 +1,41 @@
+"""
+Test Suite for Schema Bootstrap
+Tests bootstrap.py and that importing the app has no database side effects
+"""
+import subprocess
+import sys
+
+from sqlalchemy import inspect
+
+from bootstrap import bootstrap
+from conftest import engine
+
+
+def test_bootstrap_is_idempotent():
+    """Test that re-running the bootstrap on an up-to-date schema is a no-op"""
+    bootstrap(engine)
+    bootstrap(engine)
+
+    inspector = inspect(engine)
+    assert "fetched_at" in {c["name"] for c in inspector.get_columns("repositories")}
+    assert "uq_repositories_owner_name" in {c["name"] for c in inspector.get_unique_constraints("repositories")}
+    indexes = {i["name"] for i in inspector.get_indexes("repositories")}
+    assert {
+        "ix_repositories_owner_name_lower",
+        "ix_repositories_owner_lower_stars_id",
+        "ix_repositories_owner_lower_id",
+    } <= indexes
+
+
+def test_importing_main_does_not_touch_database():
+    """Test that importing the app neither builds an engine nor loads a DB driver"""
+    code = (
+        "import sys, main, database; "
+        "assert database._engine is None and database._async_engine is None; "
+        "assert 'psycopg' not in sys.modules and 'asyncpg' not in sys.modules"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True,
+        env={"DATABASE_URL": "postgresql://nobody@unreachable.invalid:5432/none", "PATH": ""},
+    )
+    assert result.returncode == 0, result.stderr
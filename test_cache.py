@@ -0,0 +1,114 @@
+"""
+Test Suite for the Repository Response Cache
+Tests cache.py and its use by GET /repos/{repo_id}
+"""
+import asyncio
+
+import pytest
+
+from cache import MemoryBackend, RedisBackend, RepoCache, repo_cache
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_expires_entries():
+    """Test that entries are dropped once their TTL passes"""
+    backend = MemoryBackend(max_size=10, ttl=0.01)
+    await backend.set("1", b"{}")
+    assert await backend.get("1") == b"{}"
+
+    await asyncio.sleep(0.02)
+
+    assert await backend.get("1") is None
+    assert backend.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_evicts_least_recently_used():
+    """Test that the backend stays within its size bound"""
+    backend = MemoryBackend(max_size=2, ttl=60)
+    await backend.set("1", b"a")
+    await backend.set("2", b"b")
+    await backend.get("1")
+    await backend.set("3", b"c")
+
+    assert await backend.get("2") is None
+    assert await backend.get("1") == b"a"
+    assert backend.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_repo_cache_hit_ratio():
+    """Test that hits and misses feed the hit ratio"""
+    cache = RepoCache(MemoryBackend(max_size=10, ttl=60))
+    assert await cache.get(1) is None
+    await cache.set(1, b"{}")
+    assert await cache.get(1) == b"{}"
+    assert await cache.get(1) == b"{}"
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == pytest.approx(2 / 3)
+
+
+def test_get_repo_served_from_cache_until_update(client, monkeypatch):
+    """Test that reads are cached and PUT invalidates the cached entry"""
+
+    async def mock_fetch(owner: str, repo: str):
+        return {
+            "name": "cached-repo",
+            "owner": {"login": "cacheuser"},
+            "stargazers_count": 5,
+            "html_url": "https://github.com/cacheuser/cached-repo"
+        }
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    repo_id = client.post(
+        "/repos",
+        json={"owner": "cacheuser", "repo_name": "cached-repo"}
+    ).json()["id"]
+
+    assert client.get(f"/repos/{repo_id}").json()["stars"] == 5
+    assert client.get(f"/repos/{repo_id}").json()["stars"] == 5
+    assert repo_cache.stats()["hits"] == 1
+
+    client.put(f"/repos/{repo_id}?stars=6")
+    assert client.get(f"/repos/{repo_id}").json()["stars"] == 6
+
+    client.delete(f"/repos/{repo_id}")
+    assert client.get(f"/repos/{repo_id}").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_errors_are_misses():
+    """Test that an unreachable Redis is treated as a cache miss"""
+    cache = RepoCache(RedisBackend("redis://127.0.0.1:1", ttl=60))
+
+    assert await cache.get(1) is None
+    await cache.set(1, b"{}")
+    await cache.invalidate(1)
+
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["errors"] == 3
+
+
+def test_get_repo_survives_redis_outage(client, monkeypatch):
+    """Test that GET /repos/{repo_id} falls through to the database when Redis is down"""
+
+    async def mock_fetch(owner: str, repo: str):
+        return {
+            "name": "redis-down",
+            "owner": {"login": "cacheuser"},
+            "stargazers_count": 5,
+            "html_url": "https://github.com/cacheuser/redis-down"
+        }
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    monkeypatch.setattr(repo_cache, "backend", RedisBackend("redis://127.0.0.1:1", ttl=60))
+    repo_id = client.post("/repos", json={"owner": "cacheuser", "repo_name": "redis-down"}).json()["id"]
+
+    response = client.get(f"/repos/{repo_id}")
+
+    assert response.status_code == 200
+    assert response.json()["stars"] == 5
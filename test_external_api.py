@@ -0,0 +1,626 @@
+"""
+Test Suite for the GitHub API Client
+Tests external_api.py against in-process transports
+"""
+import asyncio
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+import pytest_asyncio
+
+import external_api
+import fake_github as fake_github_server
+
+
+def github_payload(owner, name, stars=100):
+    return {
+        "name": name,
+        "owner": {"login": owner},
+        "stargazers_count": stars,
+        "html_url": f"https://github.com/{owner}/{name}"
+    }
+
+
+@pytest_asyncio.fixture()
+async def make_client():
+    """Factory that installs the shared client over a mock handler or an ASGI app"""
+    async def install(handler=None, app=None):
+        transport = httpx.MockTransport(handler) if app is None else httpx.ASGITransport(app=app)
+        await external_api.close_client()
+        external_api.response_cache.clear()
+        await external_api.start_client(transport=transport)
+
+    yield install
+    await external_api.close_client()
+    external_api.response_cache.clear()
+
+
+@pytest_asyncio.fixture()
+async def github_client(make_client):
+    """Install a shared client backed by a mock GitHub transport"""
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        owner, name = request.url.path.split("/")[-2:]
+        return httpx.Response(200, json=github_payload(owner, name))
+
+    await make_client(handler)
+    return seen
+
+
+@pytest.mark.asyncio
+async def test_fetch_reuses_shared_client(github_client):
+    """Test that consecutive fetches go through one long-lived client"""
+    client = external_api.get_client()
+
+    first = await external_api.fetch_github_repo("octocat", "Hello-World")
+    second = await external_api.fetch_github_repo("octocat", "Spoon-Knife")
+
+    assert external_api.get_client() is client
+    assert first["name"] == "Hello-World"
+    assert second["name"] == "Spoon-Knife"
+    assert [r.url.path for r in github_client] == [
+        "/repos/octocat/Hello-World",
+        "/repos/octocat/Spoon-Knife",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_count_requests(github_client):
+    """Test that pool stats track requests and in-flight calls"""
+    before = external_api.pool_stats()["requests_total"]
+
+    await external_api.fetch_github_repo("octocat", "Hello-World")
+
+    stats = external_api.pool_stats()
+    assert stats["requests_total"] == before + 1
+    assert stats["requests_in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_close_client_resets_shared_client(github_client):
+    """Test that closing the client lets the next start create a new one"""
+    client = external_api.get_client()
+
+    await external_api.close_client()
+
+    assert external_api.get_client() is not client
+
+
+@pytest_asyncio.fixture()
+async def fake_github(make_client):
+    """Point the shared client at the local stand-in GitHub server"""
+    app = fake_github_server.create_app()
+    await make_client(app=app)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_conditional_request_served_from_cache(fake_github):
+    """Test that a 304 from GitHub returns the cached body as a hit"""
+    fake_github_server.set_stars(fake_github, "octocat", "Hello-World", 42)
+
+    first = await external_api.fetch_github_repo("octocat", "Hello-World")
+    second = await external_api.fetch_github_repo("octocat", "Hello-World")
+
+    assert first == second
+    assert second["stargazers_count"] == 42
+    assert fake_github.state.not_modified == 1
+    stats = external_api.response_cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_changed_repo_refreshes_cache(fake_github):
+    """Test that a changed ETag replaces the cached body"""
+    fake_github_server.set_stars(fake_github, "octocat", "Hello-World", 42)
+    await external_api.fetch_github_repo("octocat", "Hello-World")
+
+    fake_github_server.set_stars(fake_github, "octocat", "Hello-World", 43)
+    data = await external_api.fetch_github_repo("octocat", "Hello-World")
+
+    assert data["stargazers_count"] == 43
+    assert external_api.response_cache.stats()["misses"] == 2
+
+
+def test_response_cache_evicts_least_recently_used():
+    """Test that the cache stays within its size bound"""
+    cache = external_api.ResponseCache(max_size=2)
+    for key in ("a", "b"):
+        cache.put(key, external_api.CachedResponse(body={}, etag=key))
+    cache.get("a")
+    cache.put("c", external_api.CachedResponse(body={}, etag="c"))
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_repo_raises(fake_github):
+    """Test that a 404 from GitHub propagates as an error"""
+    fake_github_server.set_stars(fake_github, "octocat", "missing", None)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await external_api.fetch_github_repo("octocat", "missing")
+
+
+@pytest_asyncio.fixture()
+async def slow_github(make_client):
+    """Install a shared client whose transport answers after a short delay"""
+    seen = []
+
+    async def handler(request):
+        seen.append(request)
+        await asyncio.sleep(0.05)
+        owner, name = request.url.path.split("/")[-2:]
+        if name == "broken":
+            return httpx.Response(500)
+        return httpx.Response(200, json=github_payload(owner, name))
+
+    await make_client(handler)
+    return seen
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fetches_are_coalesced(slow_github):
+    """Test that concurrent callers for one repo share a single request"""
+    before = external_api.pool_stats()["coalesced_total"]
+
+    results = await asyncio.gather(*(
+        external_api.fetch_github_repo("octocat", "Hello-World") for _ in range(5)
+    ))
+
+    assert len(slow_github) == 1
+    assert all(result["name"] == "Hello-World" for result in results)
+    assert external_api.pool_stats()["coalesced_total"] == before + 4
+
+
+@pytest.mark.asyncio
+async def test_coalesced_callers_share_errors(slow_github, monkeypatch):
+    """Test that an upstream error reaches every coalesced caller"""
+    monkeypatch.setattr("external_api.GITHUB_MAX_RETRIES", 0)
+    results = await asyncio.gather(
+        *(external_api.fetch_github_repo("octocat", "broken") for _ in range(3)),
+        return_exceptions=True
+    )
+
+    assert len(slow_github) == 1
+    assert all(isinstance(result, httpx.HTTPStatusError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_fetches_after_completion_are_not_coalesced(slow_github):
+    """Test that a finished fetch does not absorb later calls"""
+    await external_api.fetch_github_repo("octocat", "Hello-World")
+    await external_api.fetch_github_repo("octocat", "Hello-World")
+
+    assert len(slow_github) == 2
+
+
+@pytest.mark.asyncio
+async def test_fetch_records_latency_by_status(fake_github):
+    """Test that GitHub calls land in the latency histogram by status"""
+    import metrics
+
+    def count(status):
+        return metrics.registry.get_sample_value(
+            "github_request_duration_seconds_count", {"status": status}
+        ) or 0
+
+    before_ok, before_missing = count("200"), count("404")
+    fake_github_server.set_stars(fake_github, "octocat", "missing", None)
+
+    await external_api.fetch_github_repo("octocat", "Hello-World")
+    with pytest.raises(httpx.HTTPStatusError):
+        await external_api.fetch_github_repo("octocat", "missing")
+
+    assert count("200") == before_ok + 1
+    assert count("404") == before_missing + 1
+
+
+@pytest.mark.asyncio
+async def test_graphql_batches_repos(fake_github, monkeypatch):
+    """Test that multi-repo fetches are packed into aliased GraphQL queries"""
+    monkeypatch.setattr("external_api.GITHUB_GRAPHQL", "true")
+    monkeypatch.setattr("external_api.GITHUB_GRAPHQL_BATCH_SIZE", 2)
+    fake_github_server.set_stars(fake_github, "octocat", "Hello-World", 42)
+    keys = [("octocat", "Hello-World"), ("octocat", "Spoon-Knife"), ("torvalds", "linux")]
+
+    results = await external_api.fetch_github_repos(keys)
+
+    assert fake_github.state.graphql_requests == 2
+    assert fake_github.state.requests == 0
+    assert results[("octocat", "Hello-World")] == {
+        "name": "Hello-World",
+        "owner": {"login": "octocat"},
+        "stargazers_count": 42,
+        "html_url": "https://github.com/octocat/Hello-World",
+    }
+    assert set(results) == set(keys)
+
+
+@pytest.mark.asyncio
+async def test_graphql_reports_per_repo_errors(fake_github, monkeypatch):
+    """Test that a missing repo fails alone without failing its batch"""
+    monkeypatch.setattr("external_api.GITHUB_GRAPHQL", "true")
+    fake_github_server.set_stars(fake_github, "octocat", "missing", None)
+
+    results = await external_api.fetch_github_repos([("octocat", "missing"), ("octocat", "Hello-World")])
+
+    assert isinstance(results[("octocat", "missing")], external_api.GitHubError)
+    assert "octocat/missing" in str(results[("octocat", "missing")])
+    assert results[("octocat", "Hello-World")]["name"] == "Hello-World"
+
+
+@pytest.mark.asyncio
+async def test_graphql_request_failure_fails_whole_batch(make_client, monkeypatch):
+    """Test that a failed GraphQL request is reported for every repo in it"""
+    monkeypatch.setattr("external_api.GITHUB_GRAPHQL", "true")
+    await make_client(app=fake_github_server.create_app(error_rate=1.0))
+
+    results = await external_api.fetch_github_repos([("a", "one"), ("b", "two")])
+
+    assert all(isinstance(result, httpx.HTTPStatusError) for result in results.values())
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("payload", [
+    {"data": None, "errors": [{"type": "RATE_LIMITED", "message": "API rate limit exceeded"}]},
+    {"data": {"r0": None, "r1": None}, "errors": [{"type": "RATE_LIMITED", "message": "API rate limit exceeded"}]},
+])
+async def test_graphql_request_wide_errors_are_transient(make_client, monkeypatch, payload):
+    """Test that errors without a path fail the batch as retryable, not per repo"""
+    monkeypatch.setattr("external_api.GITHUB_GRAPHQL", "true")
+    monkeypatch.setattr("external_api.breaker", external_api.CircuitBreaker(window=2, min_calls=2))
+    await make_client(lambda request: httpx.Response(200, json=payload))
+
+    results = await external_api.fetch_github_repos([("a", "one"), ("b", "two")])
+
+    assert all(isinstance(result, external_api.GraphQLError) for result in results.values())
+    assert all(external_api.is_transient_failure(result) for result in results.values())
+    assert external_api.breaker.outcomes.count(False) == 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_many_without_graphql_uses_rest(fake_github, monkeypatch):
+    """Test that without a token each repo is fetched over REST"""
+    monkeypatch.setattr("external_api.GITHUB_GRAPHQL", "auto")
+    monkeypatch.setattr("external_api.credentials", external_api.CredentialPool([]))
+
+    results = await external_api.fetch_github_repos([("octocat", "Hello-World"), ("octocat", "Spoon-Knife")])
+
+    assert fake_github.state.requests == 2
+    assert fake_github.state.graphql_requests == 0
+    assert all(not isinstance(result, Exception) for result in results.values())
+
+
+def test_breaker_opens_on_error_rate_and_probes():
+    """Test that the breaker fails fast once errors cross the threshold"""
+    breaker = external_api.CircuitBreaker(window=4, min_calls=4, threshold=0.5, cooldown=0.05)
+    for success in (True, False, True, False):
+        breaker.before_call()
+        breaker.record(success)
+
+    assert breaker.state == "open"
+    with pytest.raises(external_api.CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    with pytest.raises(external_api.CircuitOpenError):
+        breaker.before_call()
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.stats()["rejected"] == 2
+
+
+@pytest.mark.asyncio
+async def test_missing_repos_do_not_trip_breaker(fake_github, monkeypatch):
+    """Test that 404s are not counted as upstream failures"""
+    monkeypatch.setattr("external_api.breaker", external_api.CircuitBreaker(window=2, min_calls=2))
+    fake_github_server.set_stars(fake_github, "octocat", "missing", None)
+
+    for _ in range(3):
+        with pytest.raises(httpx.HTTPStatusError):
+            await external_api.fetch_github_repo("octocat", "missing")
+
+    assert external_api.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_skips_upstream(make_client, monkeypatch):
+    """Test that server errors open the breaker and later calls never reach GitHub"""
+    monkeypatch.setattr("external_api.breaker", external_api.CircuitBreaker(window=2, min_calls=2))
+    monkeypatch.setattr("external_api.GITHUB_MAX_RETRIES", 0)
+    app = fake_github_server.create_app(error_rate=1.0)
+    await make_client(app=app)
+
+    for repo in ("a", "b"):
+        with pytest.raises(httpx.HTTPStatusError):
+            await external_api.fetch_github_repo("octocat", repo)
+    with pytest.raises(external_api.CircuitOpenError):
+        await external_api.fetch_github_repo("octocat", "c")
+
+    assert app.state.requests == 2
+
+
+@pytest_asyncio.fixture()
+async def flaky_github(make_client):
+    """Install a shared client whose transport follows a per-test script"""
+    script = {"delays": [], "statuses": []}
+    seen = []
+
+    async def handler(request):
+        attempt = len(seen)
+        seen.append(request)
+        delays, statuses = script["delays"], script["statuses"]
+        await asyncio.sleep(delays[attempt] if attempt < len(delays) else 0)
+        status = statuses[attempt] if attempt < len(statuses) else 200
+        owner, name = request.url.path.split("/")[-2:]
+        return httpx.Response(status, json=github_payload(owner, name))
+
+    await make_client(handler)
+    return script, seen
+
+
+@pytest.mark.asyncio
+async def test_slow_attempt_is_hedged(flaky_github, monkeypatch):
+    """Test that a slow first attempt is raced by a hedge and the faster one wins"""
+    script, seen = flaky_github
+    script["delays"] = [2, 0]
+    monkeypatch.setattr("external_api.GITHUB_HEDGE_DELAY", 0.05)
+    monkeypatch.setattr("external_api.latencies", external_api.LatencyWindow())
+    before = external_api.pool_stats()["hedges_total"]
+
+    start = time.perf_counter()
+    data = await external_api.fetch_github_repo("octocat", "hedged")
+
+    assert data["name"] == "hedged"
+    assert time.perf_counter() - start < 1
+    assert len(seen) == 2
+    assert external_api.pool_stats()["hedges_total"] == before + 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_delay_follows_recent_latencies(monkeypatch):
+    """Test that the hedge delay tracks the configured latency percentile"""
+    window = external_api.LatencyWindow(size=100, min_samples=10)
+    monkeypatch.setattr("external_api.latencies", window)
+    monkeypatch.setattr("external_api.GITHUB_HEDGE_DELAY", 1.0)
+    assert external_api.hedge_delay() == 1.0
+
+    for i in range(100):
+        window.add((i + 1) / 1000)
+    assert external_api.hedge_delay() == pytest.approx(0.096)
+
+    monkeypatch.setattr("external_api.GITHUB_HEDGE_PERCENTILE", 0)
+    assert external_api.hedge_delay() is None
+
+
+@pytest.mark.asyncio
+async def test_retryable_status_is_retried(flaky_github, monkeypatch):
+    """Test that 5xx/429 responses are retried with backoff until success"""
+    script, seen = flaky_github
+    script["statuses"] = [503, 429, 200]
+    monkeypatch.setattr("external_api.GITHUB_RETRY_BASE_DELAY", 0.01)
+    before = external_api.pool_stats()["retries_total"]
+
+    data = await external_api.fetch_github_repo("octocat", "retried")
+
+    assert data["name"] == "retried"
+    assert len(seen) == 3
+    assert external_api.pool_stats()["retries_total"] == before + 2
+
+
+@pytest.mark.asyncio
+async def test_retries_stop_at_limit_and_deadline(flaky_github, monkeypatch):
+    """Test that retries give up after GITHUB_MAX_RETRIES or the deadline"""
+    script, seen = flaky_github
+    script["statuses"] = [502] * 10
+    script["delays"] = [0.1] * 10
+    monkeypatch.setattr("external_api.GITHUB_RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr("external_api.GITHUB_MAX_RETRIES", 5)
+    monkeypatch.setattr("external_api.GITHUB_DEADLINE", 0.25)
+
+    with pytest.raises((httpx.HTTPStatusError, httpx.TimeoutException)):
+        await external_api.fetch_github_repo("octocat", "down")
+
+    assert 1 < len(seen) < 6
+
+
+def test_not_found_is_not_retried():
+    """Test that only transient statuses are retryable"""
+    assert 404 not in external_api.RETRYABLE_STATUSES
+    assert 403 not in external_api.RETRYABLE_STATUSES
+    assert external_api.retry_delay(10) <= external_api.GITHUB_RETRY_MAX_DELAY
+
+
+def quota_headers(remaining, reset_in=3600, limit=5000):
+    return {
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(int(time.time() + reset_in)),
+    }
+
+
+@pytest_asyncio.fixture()
+async def token_github(make_client, monkeypatch):
+    """Install a token pool and a transport that tracks quota per token"""
+    quotas = {"Bearer t1": 3, "Bearer t2": 5}
+    seen = []
+
+    def handler(request):
+        auth = request.headers.get("Authorization")
+        seen.append(auth)
+        owner, name = request.url.path.split("/")[-2:]
+        if auth not in quotas:
+            return httpx.Response(200, json=github_payload(owner, name))
+        if quotas[auth] == 0:
+            return httpx.Response(403, headers=quota_headers(0), json={"message": "API rate limit exceeded"})
+        quotas[auth] -= 1
+        return httpx.Response(200, headers=quota_headers(quotas[auth]), json=github_payload(owner, name))
+
+    monkeypatch.setattr("external_api.credentials", external_api.CredentialPool(["t1", "t2"]))
+    await make_client(handler)
+    return seen
+
+
+@pytest.mark.asyncio
+async def test_requests_go_to_token_with_most_headroom(token_github):
+    """Test that each request uses the token with the most quota left"""
+    for i in range(4):
+        await external_api.fetch_github_repo("octocat", f"repo-{i}")
+
+    # t1 goes first (both unknown), then t2 reports more headroom than t1.
+    assert token_github[0] == "Bearer t1"
+    assert token_github.count("Bearer t2") >= 2
+    assert external_api.credentials.remaining == sum(
+        credential.quota.remaining for credential in external_api.credentials.tokens
+    )
+
+
+@pytest.mark.asyncio
+async def test_exhausted_tokens_sit_out_until_reset(token_github):
+    """Test that tokens are used until all quota is gone, then fall back to anonymous"""
+    results = [await external_api.fetch_github_repo("octocat", f"repo-{i}") for i in range(10)]
+
+    assert all(result["name"].startswith("repo-") for result in results)
+    assert token_github.count("Bearer t1") + token_github.count("Bearer t2") >= 8
+    assert external_api.credentials.available() == []
+    assert external_api.credentials.stats()["anonymous_fallbacks"] >= 2
+    assert token_github[-1] is None
+
+
+def test_exhausted_token_returns_after_reset():
+    """Test that a token is eligible again once its reset time has passed"""
+    pool = external_api.CredentialPool(["t1"])
+    pool.tokens[0].quota.update(httpx.Headers(quota_headers(0, reset_in=-1)))
+
+    assert pool.available() == pool.tokens
+    assert pool.acquire().token == "t1"
+
+
+def test_quota_is_tracked_per_resource():
+    """Test that REST and GraphQL quota headers update separate budgets"""
+    credential = external_api.Credential("t1")
+    credential.update(httpx.Headers(quota_headers(4000)))
+    credential.update(httpx.Headers(quota_headers(10) | {"X-RateLimit-Resource": "graphql"}))
+
+    assert credential.quotas["core"].remaining == 4000
+    assert credential.quotas["graphql"].remaining == 10
+
+
+@pytest.mark.asyncio
+async def test_graphql_picks_token_by_graphql_headroom(make_client, monkeypatch):
+    """Test that GraphQL requests skip tokens out of GraphQL points without touching REST quota"""
+    monkeypatch.setattr("external_api.GITHUB_GRAPHQL", "true")
+    pool = external_api.CredentialPool(["t1", "t2"])
+    pool.tokens[0].update(httpx.Headers(quota_headers(4000)))
+    pool.tokens[0].update(httpx.Headers(quota_headers(0) | {"X-RateLimit-Resource": "graphql"}))
+    pool.tokens[1].update(httpx.Headers(quota_headers(100)))
+    monkeypatch.setattr("external_api.credentials", pool)
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers["Authorization"])
+        data = {"r0": {"name": "one", "owner": {"login": "a"}, "stargazerCount": 1, "url": "https://github.com/a/one"}}
+        return httpx.Response(200, json={"data": data})
+
+    await make_client(handler)
+    await external_api.fetch_github_repos([("a", "one")])
+
+    assert seen == ["Bearer t2"]
+    assert pool.tokens[0].quota.remaining == 4000
+    assert pool.tokens[1].quota.remaining == 100
+    assert pool.acquire().token == "t1"
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_token_switches_immediately(make_client, monkeypatch):
+    """Test that a 403 for an exhausted token is retried at once with another token"""
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("Authorization"))
+        owner, name = request.url.path.split("/")[-2:]
+        if request.headers.get("Authorization") == "Bearer spent":
+            return httpx.Response(403, headers=quota_headers(0), json={"message": "API rate limit exceeded"})
+        return httpx.Response(200, headers=quota_headers(100), json=github_payload(owner, name))
+
+    monkeypatch.setattr("external_api.credentials", external_api.CredentialPool(["spent", "fresh"]))
+    monkeypatch.setattr("external_api.GITHUB_RETRY_BASE_DELAY", 10)
+    await make_client(handler)
+
+    data = await external_api.fetch_github_repo("octocat", "switch")
+
+    assert data["name"] == "switch"
+    assert seen == ["Bearer spent", "Bearer fresh"]
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_survives_restart(fake_github, monkeypatch, tmp_path):
+    """Test that a restarted worker revalidates from the on-disk cache"""
+    path = str(tmp_path / "github.sqlite3")
+    monkeypatch.setattr("external_api.disk_cache", external_api.DiskCache(path))
+    first = await external_api.fetch_github_repo("octocat", "Hello-World")
+
+    # A new process starts with an empty memory cache and a fresh connection.
+    external_api.response_cache.clear()
+    monkeypatch.setattr("external_api.disk_cache", external_api.DiskCache(path))
+    second = await external_api.fetch_github_repo("octocat", "Hello-World")
+
+    assert second == first
+    assert fake_github.state.not_modified == 1
+    assert external_api.disk_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_ttl_and_size_eviction(tmp_path):
+    """Test that expired entries are ignored and the oldest go over the size limit"""
+    cache = external_api.DiskCache(str(tmp_path / "github.sqlite3"), ttl=60, max_entries=2)
+    now = time.time()
+    await cache.put("old", external_api.CachedResponse({"n": 0}, etag='"0"', fetched_at=now - 120))
+    for i in range(1, 4):
+        await cache.put(f"k{i}", external_api.CachedResponse({"n": i}, etag=f'"{i}"', fetched_at=now + i))
+
+    assert await cache.get("old") is None
+    await cache.prune()
+
+    assert cache.stats()["evictions"] == 2
+    assert await cache.get("k1") is None
+    assert (await cache.get("k3")).body == {"n": 3}
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_counts_failed_writes_separately(tmp_path):
+    """Test that a write SQLite rejected is not reported as a write"""
+    cache = external_api.DiskCache(str(tmp_path))  # a directory, so SQLite cannot open it
+
+    await cache.put("octocat/broken", external_api.CachedResponse({"name": "broken"}, etag='"x"'))
+
+    stats = cache.stats()
+    assert stats["writes"] == 0
+    assert stats["write_errors"] == 1
+
+
+def test_disk_cache_is_shared_across_processes(tmp_path):
+    """Test that an entry written by another process is visible here"""
+    path = str(tmp_path / "github.sqlite3")
+    code = (
+        "import asyncio, external_api; "
+        f"cache = external_api.DiskCache({path!r}); "
+        "asyncio.run(cache.put('octocat/shared', external_api.CachedResponse({'name': 'shared'}, etag='\"x\"')))"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+    entry = external_api.DiskCache(path)._get("octocat/shared")
+
+    assert entry.body == {"name": "shared"}
+    assert entry.etag == '"x"'
@@ -0,0 +1,84 @@
+"""
+Test Suite for Star History
+Tests history.py and GET /repos/{repo_id}/history
+"""
+import pytest
+from sqlalchemy import select
+
+from conftest import TestingAsyncSessionLocal
+from history import record_stars
+from models import Repository, StarRollup, StarSnapshot
+
+
+def create_tracked_repo(client, monkeypatch, name, stars):
+    async def mock_fetch(owner: str, repo: str):
+        return {
+            "name": repo,
+            "owner": {"login": owner},
+            "stargazers_count": stars,
+            "html_url": f"https://github.com/{owner}/{repo}"
+        }
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    return client.post("/repos", json={"owner": "historian", "repo_name": name}).json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_record_stars_skips_unchanged_values():
+    """Test that snapshots are only written when the value changes"""
+    async with TestingAsyncSessionLocal() as db:
+        repo = Repository(name="quiet", owner="historian", stars=1, url="https://github.com/historian/quiet")
+        db.add(repo)
+        await db.flush()
+
+        for stars in (1, 1, 2, 2, 1):
+            await record_stars(db, [(repo.id, stars)])
+            await db.commit()
+
+        snapshots = list(await db.scalars(
+            select(StarSnapshot.stars).where(StarSnapshot.repo_id == repo.id)
+        ))
+        rollups = list(await db.scalars(
+            select(StarRollup).where(StarRollup.repo_id == repo.id).order_by(StarRollup.resolution)
+        ))
+
+    assert len(snapshots) == 3
+    assert [rollup.resolution for rollup in rollups] == ["day", "hour"]
+    day = rollups[0]
+    assert (day.min_stars, day.max_stars, day.last_stars, day.samples) == (1, 2, 1, 3)
+
+
+def test_history_endpoint_reads_rollups(client, monkeypatch):
+    """Test that create and update feed the history endpoint"""
+    repo_id = create_tracked_repo(client, monkeypatch, "trend", 10)
+    client.put(f"/repos/{repo_id}?stars=15")
+    client.put(f"/repos/{repo_id}?stars=15")
+    client.put(f"/repos/{repo_id}?stars=12")
+
+    response = client.get(f"/repos/{repo_id}/history", params={"resolution": "hour"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["resolution"] == "hour"
+    assert len(data["points"]) == 1
+    point = data["points"][0]
+    assert (point["min_stars"], point["max_stars"], point["last_stars"]) == (10, 15, 12)
+
+
+def test_history_endpoint_filters_by_range(client, monkeypatch):
+    """Test that from/to bound the returned buckets"""
+    repo_id = create_tracked_repo(client, monkeypatch, "ranged", 3)
+
+    response = client.get(
+        f"/repos/{repo_id}/history",
+        params={"from": "2000-01-01T00:00:00Z", "to": "2000-01-02T00:00:00Z"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["points"] == []
+
+
+def test_history_endpoint_not_found(client):
+    """Test history for a non-existent repository"""
+    response = client.get("/repos/99999/history")
+    assert response.status_code == 404
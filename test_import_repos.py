@@ -0,0 +1,130 @@
+"""
+Test Suite for the Bulk Import CLI
+Tests import_repos.py streaming, batching and checkpoint resume
+"""
+import json
+
+import pytest
+from sqlalchemy import select
+
+import external_api
+from conftest import TestingAsyncSessionLocal
+from import_repos import import_file, read_checkpoint
+from models import Repository
+
+
+def write_jsonl(path, names, owner="importer"):
+    with open(path, "w") as f:
+        for name in names:
+            f.write(json.dumps({"owner": owner, "repo_name": name}) + "\n")
+
+
+def make_fetch(calls, fail=()):
+    async def mock_fetch(owner: str, repo: str):
+        calls.append(repo)
+        if repo in fail:
+            raise Exception("GitHub API error")
+        return {
+            "name": repo,
+            "owner": {"login": owner},
+            "stargazers_count": 7,
+            "html_url": f"https://github.com/{owner}/{repo}"
+        }
+    return mock_fetch
+
+
+async def imported_names(owner):
+    async with TestingAsyncSessionLocal() as db:
+        return set(await db.scalars(select(Repository.name).where(Repository.owner == owner)))
+
+
+@pytest.mark.asyncio
+async def test_import_file_loads_every_record(tmp_path):
+    """Test that every valid line is fetched and stored in batches"""
+    path = tmp_path / "repos.jsonl"
+    write_jsonl(path, [f"r{i}" for i in range(7)])
+    with open(path, "a") as f:
+        f.write("not json\n")
+    calls = []
+
+    result = await import_file(
+        str(path), batch_size=3, concurrency=2,
+        session_factory=TestingAsyncSessionLocal, fetch=make_fetch(calls, fail={"r4"})
+    )
+
+    assert result["lines"] == 8
+    assert result["imported"] == 6
+    assert result["failed"] == 2
+    assert result["offset"] == path.stat().st_size
+    assert await imported_names("importer") == {f"r{i}" for i in range(7)} - {"r4"}
+
+
+@pytest.mark.asyncio
+async def test_import_file_resumes_from_checkpoint(tmp_path):
+    """Test that a second run only processes lines after the checkpoint"""
+    path = tmp_path / "repos.jsonl"
+    write_jsonl(path, ["a", "b"], owner="resumer")
+    first_calls = []
+    await import_file(
+        str(path), batch_size=2,
+        session_factory=TestingAsyncSessionLocal, fetch=make_fetch(first_calls)
+    )
+
+    write_jsonl(tmp_path / "more.jsonl", ["c"], owner="resumer")
+    with open(path, "a") as f:
+        f.write((tmp_path / "more.jsonl").read_text())
+    second_calls = []
+    result = await import_file(
+        str(path), batch_size=2,
+        session_factory=TestingAsyncSessionLocal, fetch=make_fetch(second_calls)
+    )
+
+    assert first_calls == ["a", "b"]
+    assert second_calls == ["c"]
+    assert result["lines"] == 3
+    assert read_checkpoint(f"{path}.checkpoint")["offset"] == path.stat().st_size
+    assert await imported_names("resumer") == {"a", "b", "c"}
+
+
+@pytest.mark.asyncio
+async def test_import_file_retries_transient_failures(tmp_path):
+    """Test that records hit by a GitHub outage are retried, not counted as failed"""
+    path = tmp_path / "repos.jsonl"
+    write_jsonl(path, ["up", "flaky"], owner="outage")
+    calls = []
+    outage = iter([True])
+
+    async def mock_fetch(owner: str, repo: str):
+        if repo == "flaky" and next(outage, False):
+            calls.append(repo)
+            raise external_api.CircuitOpenError("GitHub circuit breaker is open")
+        return await make_fetch(calls)(owner, repo)
+
+    result = await import_file(
+        str(path), session_factory=TestingAsyncSessionLocal, fetch=mock_fetch, retry_delay=0
+    )
+
+    assert calls.count("flaky") == 2
+    assert result["imported"] == 2
+    assert result["failed"] == 0
+    assert await imported_names("outage") == {"up", "flaky"}
+
+
+@pytest.mark.asyncio
+async def test_import_file_stops_before_checkpointing_during_outage(tmp_path):
+    """Test that a lasting outage stops the import without moving the checkpoint"""
+    path = tmp_path / "repos.jsonl"
+    write_jsonl(path, ["a", "b"], owner="down")
+
+    async def mock_fetch(owner: str, repo: str):
+        raise external_api.CircuitOpenError("GitHub circuit breaker is open")
+
+    with pytest.raises(RuntimeError):
+        await import_file(
+            str(path), session_factory=TestingAsyncSessionLocal, fetch=mock_fetch,
+            retry_delay=0, max_retries=2,
+        )
+
+    assert read_checkpoint(f"{path}.checkpoint")["offset"] == 0
+    result = await import_file(str(path), session_factory=TestingAsyncSessionLocal, fetch=make_fetch([]))
+    assert result["imported"] == 2
@@ -0,0 +1,108 @@
+"""
+Test Suite for Metrics
+Tests metrics.py instrumentation and the /metrics endpoint
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import metrics
+from conftest import TEST_DATABASE_URL
+
+
+def sample(name, labels=None):
+    return metrics.registry.get_sample_value(name, labels or {}) or 0
+
+
+def test_metrics_endpoint_reports_route_latency(client):
+    """Test that requests are recorded per route template"""
+    before = sample("http_request_duration_seconds_count",
+                    {"method": "GET", "route": "/repos/{repo_id}", "status": "404"})
+
+    client.get("/repos/99999")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/repos/{repo_id}"' in response.text
+    assert "repo_cache_hit_ratio" in response.text
+    assert "db_pool_saturation" in response.text
+    after = sample("http_request_duration_seconds_count",
+                   {"method": "GET", "route": "/repos/{repo_id}", "status": "404"})
+    assert after == before + 1
+
+
+def test_stats_collector_types_counters_and_gauges():
+    """Test that cumulative stats are published as counters and the rest as gauges"""
+    collector = metrics.StatsCollector()
+    collector.register("demo", lambda: {"hits": 3, "requests_total": 5, "size": 2, "ratio": None},
+                       "Demo stats", counters=("hits", "requests_total"))
+
+    families = {family.name: family for family in collector.collect()}
+
+    assert families["demo_hits"].type == "counter"
+    assert families["demo_hits"].samples[0].name == "demo_hits_total"
+    assert families["demo_requests"].type == "counter"
+    assert families["demo_requests"].samples[0].name == "demo_requests_total"
+    assert families["demo_size"].type == "gauge"
+    assert "demo_ratio" not in families
+
+
+def test_metrics_endpoint_exposes_cumulative_stats_as_counters(client):
+    """Test that /metrics types cache and client counters as counters"""
+    text = client.get("/metrics").text
+
+    assert "# TYPE repo_cache_hits_total counter" in text
+    assert "# TYPE github_client_requests_total counter" in text
+    assert "# TYPE github_client_requests_in_flight gauge" in text
+    assert "# TYPE repo_cache_size gauge" in text
+
+
+def test_instrumented_engine_counts_statements():
+    """Test that engine events record statement counts and timings"""
+    engine = create_engine(TEST_DATABASE_URL)
+    metrics.instrument_engine(engine)
+    before = sample("db_statements_total", {"operation": "SELECT"})
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
+    engine.dispose()
+
+    assert sample("db_statements_total", {"operation": "SELECT"}) == before + 2
+    assert sample("db_statement_duration_seconds_count", {"operation": "SELECT"}) >= 2
+
+
+@pytest.mark.asyncio
+async def test_timed_pool_records_checkout_wait():
+    """Test that connection checkouts are timed"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
+        poolclass=metrics.TimedQueuePool,
+    )
+    before = sample("db_pool_checkout_wait_seconds_count")
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        stats = metrics.db_pool_stats(engine.pool)
+    await engine.dispose()
+
+    assert sample("db_pool_checkout_wait_seconds_count") == before + 1
+    assert stats["checked_out"] == 1
+    assert 0 < stats["saturation"] <= 1
+
+
+def test_statement_operation_labels():
+    """Test that statements map onto a small set of operation labels"""
+    assert metrics.statement_operation("  select * from repositories") == "SELECT"
+    assert metrics.statement_operation("WITH inserted AS (...) INSERT ...") == "WITH"
+    assert metrics.statement_operation("VACUUM") == "OTHER"
+
+
+def test_startup_duration_recorded(client):
+    """Test that running the lifespan records worker cold start timings"""
+    with client:
+        response = client.get("/metrics")
+
+    assert 'app_startup_duration_seconds{phase="import"}' in response.text
+    assert sample("app_startup_duration_seconds", {"phase": "lifespan"}) > 0
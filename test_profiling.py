@@ -0,0 +1,59 @@
+"""
+Test Suite for Request Profiling
+Tests profiling.py statement budgets and profile reports
+"""
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import profiling
+from conftest import TestingAsyncSessionLocal, async_engine
+
+
+@pytest.fixture()
+def profiled_client(monkeypatch, tmp_path):
+    """App with profiling middleware and a route issuing a chosen number of queries"""
+    monkeypatch.setattr("profiling.SQL_STATEMENT_BUDGET", 3)
+    monkeypatch.setattr("profiling.PROFILE_DIR", str(tmp_path))
+    profiling.count_statements(async_engine.sync_engine)
+
+    app = FastAPI()
+    app.middleware("http")(profiling.profile_request)
+
+    @app.get("/queries/{count}")
+    async def run_queries(count: int):
+        async with TestingAsyncSessionLocal() as db:
+            for i in range(count):
+                await db.execute(text(f"SELECT {i}"))
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_statements_are_counted_per_request(profiled_client):
+    """Test that each request reports how many statements it issued"""
+    response = profiled_client.get("/queries/2")
+
+    assert response.headers["X-SQL-Statements"] == "2"
+    assert "X-SQL-Budget-Exceeded" not in response.headers
+    assert "X-Profile-Report" not in response.headers
+
+
+def test_requests_over_budget_are_flagged(profiled_client):
+    """Test that going over the statement budget flags the request"""
+    response = profiled_client.get("/queries/5")
+
+    assert response.headers["X-SQL-Statements"] == "5"
+    assert response.headers["X-SQL-Budget-Exceeded"] == "true"
+
+
+def test_profile_header_writes_report(profiled_client, tmp_path):
+    """Test that the debug header stores a cProfile report"""
+    response = profiled_client.get("/queries/1", headers={"X-Debug-Profile": "1"})
+
+    report = response.headers["X-Profile-Report"]
+    assert os.path.exists(tmp_path / report)
+    assert "function calls" in (tmp_path / report).read_text()
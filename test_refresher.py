@@ -0,0 +1,184 @@
+"""
+Test Suite for the Background Star Refresher
+Tests refresher.py pacing and batch write-back
+"""
+import time
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import delete, select
+
+import external_api
+from conftest import TestingAsyncSessionLocal
+from models import Repository
+from refresher import StarRefresher, TokenBucket
+
+
+def make_rate_limit(remaining, reset_in):
+    rate_limit = external_api.RateLimit()
+    rate_limit.remaining = remaining
+    rate_limit.reset = time.time() + reset_in
+    return rate_limit
+
+
+def test_token_bucket_spreads_quota_until_reset():
+    """Test that the refill rate is the spare quota over the time to reset"""
+    bucket = TokenBucket(make_rate_limit(1100, 100), reserve=100, capacity=5)
+    assert bucket.rate() == pytest.approx(10, rel=0.01)
+
+
+def test_token_bucket_waits_for_reset_when_quota_is_reserved():
+    """Test that the bucket stops once only the reserve is left"""
+    bucket = TokenBucket(make_rate_limit(50, 30), reserve=100, capacity=5)
+    assert bucket.delay() == 0
+    assert bucket.delay() == pytest.approx(30, abs=1)
+
+
+def test_token_bucket_uses_default_rate_before_headers():
+    """Test that an unknown quota falls back to the default rate"""
+    bucket = TokenBucket(external_api.RateLimit(), reserve=0, capacity=1, default_rate=2)
+    assert bucket.delay() == 0
+    assert bucket.delay() == pytest.approx(0.5, abs=0.05)
+
+
+@pytest.mark.asyncio
+async def test_refresh_batch_updates_stale_repos():
+    """Test that stale repos are re-fetched and written back in one batch"""
+    async with TestingAsyncSessionLocal() as db:
+        db.add_all([
+            Repository(name="fresh-me", owner="refresher", stars=1, url="https://github.com/refresher/fresh-me"),
+            Repository(name="gone", owner="refresher", stars=2, url="https://github.com/refresher/gone"),
+        ])
+        await db.commit()
+
+    async def mock_fetch(owner: str, repo: str):
+        if repo == "gone":
+            raise Exception("GitHub API error")
+        return {
+            "name": repo,
+            "owner": {"login": owner},
+            "stargazers_count": 99,
+            "html_url": f"https://github.com/{owner}/{repo}"
+        }
+
+    refresher = StarRefresher(
+        session_factory=TestingAsyncSessionLocal,
+        fetch=mock_fetch,
+        bucket=TokenBucket(make_rate_limit(5000, 3600), reserve=0, capacity=10),
+        min_age=0,
+    )
+    assert await refresher.refresh_batch() >= 2
+
+    async with TestingAsyncSessionLocal() as db:
+        repos = {
+            repo.name: repo
+            for repo in await db.scalars(select(Repository).where(Repository.owner == "refresher"))
+        }
+    assert repos["fresh-me"].stars == 99
+    assert repos["gone"].stars == 2
+    assert refresher.failed >= 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_batch_keeps_transient_failures_due():
+    """Test that repos skipped during an outage are not pushed back in the queue"""
+    async with TestingAsyncSessionLocal() as db:
+        db.add(Repository(
+            name="outage", owner="refresher-down", stars=3, url="https://github.com/refresher-down/outage",
+            fetched_at=datetime(2000, 1, 1, tzinfo=timezone.utc),
+        ))
+        await db.commit()
+        before = await db.scalar(select(Repository.fetched_at).where(Repository.owner == "refresher-down"))
+
+    async def mock_fetch(owner: str, repo: str):
+        raise external_api.CircuitOpenError("GitHub circuit breaker is open")
+
+    refresher = StarRefresher(
+        session_factory=TestingAsyncSessionLocal,
+        fetch=mock_fetch,
+        bucket=TokenBucket(make_rate_limit(5000, 3600), reserve=0, capacity=10),
+        batch_size=1,
+        min_age=0,
+    )
+    await refresher.refresh_batch()
+
+    async with TestingAsyncSessionLocal() as db:
+        after = await db.scalar(select(Repository.fetched_at).where(Repository.owner == "refresher-down"))
+    assert after == before
+    assert refresher.deferred >= 1
+    assert refresher.failed == 0
+
+
+@pytest.mark.asyncio
+async def test_refresh_batch_does_not_resurrect_deleted_repos():
+    """Test that a repo deleted while its batch is fetched stays deleted"""
+    async with TestingAsyncSessionLocal() as db:
+        repo = Repository(
+            name="zombie", owner="refresher-deleted", stars=1, url="https://github.com/refresher-deleted/zombie",
+            fetched_at=datetime(2000, 1, 1, tzinfo=timezone.utc),
+        )
+        db.add(repo)
+        await db.commit()
+        repo_id = repo.id
+
+    async def mock_fetch(owner: str, repo: str):
+        if repo == "zombie":
+            async with TestingAsyncSessionLocal() as db:
+                await db.execute(delete(Repository).where(Repository.id == repo_id))
+                await db.commit()
+        return {
+            "name": repo,
+            "owner": {"login": owner},
+            "stargazers_count": 50,
+            "html_url": f"https://github.com/{owner}/{repo}"
+        }
+
+    refresher = StarRefresher(
+        session_factory=TestingAsyncSessionLocal,
+        fetch=mock_fetch,
+        bucket=TokenBucket(make_rate_limit(10_000_000, 3600), reserve=0, capacity=100),
+        min_age=0,
+    )
+    await refresher.refresh_batch()
+
+    async with TestingAsyncSessionLocal() as db:
+        remaining = list(await db.scalars(select(Repository).where(Repository.owner == "refresher-deleted")))
+    assert remaining == []
+
+
+@pytest.mark.asyncio
+async def test_refresh_batch_prefers_popular_repos_within_an_hour():
+    """Test that repos stale within the same hour are refreshed most starred first"""
+    async with TestingAsyncSessionLocal() as db:
+        db.add_all([
+            Repository(name=name, owner="refresher-priority", stars=stars, url=f"https://github.com/x/{name}",
+                       fetched_at=fetched_at)
+            for name, stars, fetched_at in [
+                ("oldest", 5, datetime(1990, 1, 1, 8, 0, tzinfo=timezone.utc)),
+                ("small", 1, datetime(1990, 1, 1, 9, 10, tzinfo=timezone.utc)),
+                ("popular", 100, datetime(1990, 1, 1, 9, 50, tzinfo=timezone.utc)),
+            ]
+        ])
+        await db.commit()
+    fetched = []
+
+    async def mock_fetch(owner: str, repo: str):
+        fetched.append(repo)
+        return {
+            "name": repo,
+            "owner": {"login": owner},
+            "stargazers_count": 1,
+            "html_url": f"https://github.com/{owner}/{repo}"
+        }
+
+    refresher = StarRefresher(
+        session_factory=TestingAsyncSessionLocal,
+        fetch=mock_fetch,
+        bucket=TokenBucket(make_rate_limit(10_000_000, 3600), reserve=0, capacity=100),
+        batch_size=3,
+        concurrency=1,
+        min_age=0,
+    )
+    await refresher.refresh_batch()
+
+    assert fetched == ["oldest", "popular", "small"]
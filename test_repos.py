@@ -1,3 +1,6 @@
+import asyncio
+import time
+
 import pytest
 from unittest.mock import AsyncMock, patch
 
@@ -112,6 +115,32 @@ def test_update_repo_success(client, monkeypatch):
     assert get_response.json()["stars"] == 200
 
 
+def test_update_repo_is_one_statement(client, monkeypatch):
+    """Test that a PUT writes the stars and their history in one round trip"""
+    from sqlalchemy import event
+    from conftest import async_engine
+
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {"name": repo, "owner": {"login": owner}}
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    repo_id = client.post("/repos", json={"owner": "roundtrip", "repo_name": "put"}).json()["id"]
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        assert client.put(f"/repos/{repo_id}?stars=321").status_code == 200
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+
+    assert len(statements) == 1
+    history = client.get(f"/repos/{repo_id}/history", params={"resolution": "hour"}).json()
+    assert history["points"][-1]["last_stars"] == 321
+
+
 def test_update_repo_not_found(client):
     """Test updating a non-existent repository"""
     response = client.put("/repos/99999?stars=200")
@@ -147,3 +176,494 @@ def test_delete_repo_not_found(client):
     response = client.delete("/repos/99999")
     assert response.status_code == 404
     assert response.json()["detail"] == "Repository not found"
+
+
+def test_create_repos_batch(client, monkeypatch):
+    """Test batch creation reports per-item success and failure"""
+
+    async def mock_fetch(owner: str, repo: str):
+        if repo == "missing":
+            raise Exception("GitHub API error")
+        return {
+            "name": repo,
+            "owner": {"login": owner},
+            "stargazers_count": 10,
+            "html_url": f"https://github.com/{owner}/{repo}"
+        }
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+
+    response = client.post(
+        "/repos/batch",
+        json=[
+            {"owner": "batch", "repo_name": "one"},
+            {"owner": "batch", "repo_name": "missing"},
+            {"owner": "batch", "repo_name": "two"},
+        ]
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 2
+    assert data["failed"] == 1
+    assert [r["ok"] for r in data["results"]] == [True, False, True]
+    assert data["results"][0]["repo"]["name"] == "one"
+    assert data["results"][1]["error"] == "GitHub API failed"
+    assert data["results"][2]["repo"]["name"] == "two"
+
+    repo_id = data["results"][2]["repo"]["id"]
+    assert client.get(f"/repos/{repo_id}").json()["name"] == "two"
+
+
+def test_create_repos_batch_respects_concurrency_cap(client, monkeypatch):
+    """Test batch fetches never exceed the configured concurrency"""
+    import asyncio
+
+    in_flight = 0
+    peak = 0
+
+    async def mock_fetch(owner: str, repo: str):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {
+            "name": repo,
+            "owner": {"login": owner},
+            "stargazers_count": 1,
+            "html_url": f"https://github.com/{owner}/{repo}"
+        }
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    monkeypatch.setattr("main.BATCH_FETCH_CONCURRENCY", 3)
+
+    response = client.post(
+        "/repos/batch",
+        json=[{"owner": "capped", "repo_name": f"repo{i}"} for i in range(10)]
+    )
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 10
+    assert peak == 3
+
+
+def test_create_repos_batch_too_large(client, monkeypatch):
+    """Test batch rejects payloads above the item limit"""
+    monkeypatch.setattr("main.BATCH_MAX_ITEMS", 2)
+
+    response = client.post(
+        "/repos/batch",
+        json=[{"owner": "o", "repo_name": f"r{i}"} for i in range(3)]
+    )
+
+    assert response.status_code == 413
+
+
+def test_list_repos_keyset_pagination(client, monkeypatch):
+    """Test listing walks every page in star order without repeats"""
+    stars = {"a": 30, "b": 10, "c": 30, "d": 20, "e": 5}
+
+    async def mock_fetch(owner: str, repo: str):
+        return {
+            "name": repo,
+            "owner": {"login": owner},
+            "stargazers_count": stars[repo],
+            "html_url": f"https://github.com/{owner}/{repo}"
+        }
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    for name in stars:
+        client.post("/repos", json={"owner": "pager", "repo_name": name})
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"owner": "pager", "sort": "stars", "limit": 2, "min_stars": 10}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/repos", params=params).json()
+        seen.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [repo["stars"] for repo in seen] == [30, 30, 20, 10]
+    assert len({repo["id"] for repo in seen}) == 4
+    assert seen[0]["id"] > seen[1]["id"]
+
+
+def test_list_repos_by_id(client, monkeypatch):
+    """Test listing by id returns ascending ids after the cursor"""
+
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {"name": repo, "owner": {"login": owner}}
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    ids = [
+        client.post("/repos", json={"owner": "lister", "repo_name": f"list{i}"}).json()["id"]
+        for i in range(3)
+    ]
+
+    first = client.get("/repos", params={"owner": "lister", "limit": 2}).json()
+    second = client.get(
+        "/repos", params={"owner": "lister", "limit": 2, "cursor": first["next_cursor"]}
+    ).json()
+
+    assert [repo["id"] for repo in first["items"] + second["items"]] == ids
+    assert second["next_cursor"] is None
+
+
+def test_list_repos_owner_filter_ignores_case(client, monkeypatch):
+    """Test the owner filter matches however the owner is capitalised"""
+
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {"name": repo, "owner": {"login": owner}}
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    created = client.post("/repos", json={"owner": "MixedCase", "repo_name": "listed"}).json()
+
+    listed = client.get("/repos", params={"owner": "mixedcase"}).json()["items"]
+
+    assert [repo["id"] for repo in listed] == [created["id"]]
+
+
+def test_list_repos_invalid_cursor(client):
+    """Test listing rejects a malformed cursor"""
+    response = client.get("/repos", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_create_repo_is_idempotent(client, monkeypatch):
+    """Test creating a tracked, fresh repo returns it without calling GitHub"""
+    calls = []
+
+    async def mock_fetch(owner: str, repo: str):
+        calls.append(repo)
+        return mock_github_response() | {"name": repo, "owner": {"login": owner}}
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+
+    first = client.post("/repos", json={"owner": "idem", "repo_name": "once"})
+    second = client.post("/repos", json={"owner": "idem", "repo_name": "once"})
+
+    assert first.status_code == 201
+    assert second.status_code == 200
+    assert first.json()["id"] == second.json()["id"]
+    assert calls == ["once"]
+
+
+def test_create_repo_refreshes_stale_repo(client, monkeypatch):
+    """Test creating a tracked but stale repo upserts the fetched data in place"""
+    stars = iter([10, 20])
+
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {
+            "name": repo, "owner": {"login": owner}, "stargazers_count": next(stars)
+        }
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    monkeypatch.setattr("crud.REPO_FRESHNESS_SECONDS", 0)
+
+    first = client.post("/repos", json={"owner": "idem", "repo_name": "stale"})
+    second = client.post("/repos", json={"owner": "idem", "repo_name": "stale"})
+
+    assert second.status_code == 201
+    assert second.json()["id"] == first.json()["id"]
+    assert second.json()["stars"] == 20
+    listed = client.get("/repos", params={"owner": "idem"}).json()["items"]
+    assert [repo["name"] for repo in listed].count("stale") == 1
+
+
+def test_create_repo_refresh_invalidates_cached_get(client, monkeypatch):
+    """Test that re-fetching a stale repo is visible through a cached GET"""
+    stars = iter([10, 20])
+
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {
+            "name": repo, "owner": {"login": owner}, "stargazers_count": next(stars)
+        }
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    monkeypatch.setattr("crud.REPO_FRESHNESS_SECONDS", 0)
+
+    repo_id = client.post("/repos", json={"owner": "cached", "repo_name": "stale"}).json()["id"]
+    assert client.get(f"/repos/{repo_id}").json()["stars"] == 10
+    client.post("/repos", json={"owner": "cached", "repo_name": "stale"})
+
+    assert client.get(f"/repos/{repo_id}").json()["stars"] == 20
+
+
+def test_create_repos_batch_refresh_invalidates_cached_get(client, monkeypatch):
+    """Test that a batch re-fetch of a stale repo is visible through a cached GET"""
+    stars = iter([10, 20])
+
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {
+            "name": repo, "owner": {"login": owner}, "stargazers_count": next(stars)
+        }
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    monkeypatch.setattr("crud.REPO_FRESHNESS_SECONDS", 0)
+    payload = [{"owner": "cached", "repo_name": "batch-stale"}]
+
+    repo_id = client.post("/repos/batch", json=payload).json()["results"][0]["repo"]["id"]
+    assert client.get(f"/repos/{repo_id}").json()["stars"] == 10
+    client.post("/repos/batch", json=payload)
+
+    assert client.get(f"/repos/{repo_id}").json()["stars"] == 20
+
+
+def test_export_repos_ndjson(client, monkeypatch):
+    """Test the streaming NDJSON export includes every tracked repo"""
+    import json
+
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {"name": repo, "owner": {"login": owner}}
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    monkeypatch.setattr("export.EXPORT_CHUNK_SIZE", 2)
+    client.post("/repos/batch", json=[{"owner": "exporter", "repo_name": f"e{i}"} for i in range(5)])
+
+    response = client.get("/repos/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    exported = [row["name"] for row in rows if row["owner"] == "exporter"]
+    assert exported == [f"e{i}" for i in range(5)]
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+
+
+def test_export_repos_csv(client, monkeypatch):
+    """Test the streaming CSV export writes a header and one line per repo"""
+    import csv
+
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {"name": repo, "owner": {"login": owner}}
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    client.post("/repos", json={"owner": "exporter", "repo_name": "csv-row"})
+
+    response = client.get("/repos/export", params={"format": "csv"})
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(response.text.splitlines()))
+    assert list(rows[0]) == ["id", "name", "owner", "stars", "url", "fetched_at"]
+    assert any(row["name"] == "csv-row" for row in rows)
+
+
+def test_lookup_repos_in_request_order(client, monkeypatch):
+    """Test multi-get returns repos in request order and lists missing ids"""
+
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {"name": repo, "owner": {"login": owner}}
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    results = client.post(
+        "/repos/batch", json=[{"owner": "looker", "repo_name": f"l{i}"} for i in range(3)]
+    ).json()["results"]
+    ids = [result["repo"]["id"] for result in results]
+
+    response = client.get("/repos/lookup", params={"ids": [ids[2], 99999, ids[0], ids[2]]})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [repo["id"] for repo in data["items"]] == [ids[2], ids[0]]
+    assert data["items"][0]["name"] == "l2"
+    assert data["missing"] == [99999]
+
+    response = client.post("/repos/lookup", json={"ids": ids + [99998]})
+    assert [repo["id"] for repo in response.json()["items"]] == ids
+    assert response.json()["missing"] == [99998]
+
+
+def test_lookup_repos_too_many_ids(client, monkeypatch):
+    """Test multi-get rejects more ids than the configured limit"""
+    monkeypatch.setattr("main.LOOKUP_MAX_IDS", 2)
+
+    response = client.post("/repos/lookup", json={"ids": [1, 2, 3]})
+
+    assert response.status_code == 413
+
+
+def test_bulk_update_stars(client, monkeypatch):
+    """Test bulk star updates apply in one call and report missing ids"""
+
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {"name": repo, "owner": {"login": owner}}
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    results = client.post(
+        "/repos/batch", json=[{"owner": "bulkstars", "repo_name": f"s{i}"} for i in range(2)]
+    ).json()["results"]
+    first, second = [result["repo"]["id"] for result in results]
+    assert client.get(f"/repos/{first}").json()["stars"] == 100
+
+    response = client.patch(
+        "/repos",
+        json=[{"id": first, "stars": 1}, {"id": 99999, "stars": 2}, {"id": second, "stars": 3}]
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"updated": 2, "missing": [99999]}
+    assert client.get(f"/repos/{first}").json()["stars"] == 1
+    assert client.get(f"/repos/{second}").json()["stars"] == 3
+
+
+def test_bulk_update_stars_too_large(client, monkeypatch):
+    """Test bulk star updates reject payloads above the item limit"""
+    monkeypatch.setattr("main.BULK_UPDATE_MAX_ITEMS", 1)
+
+    response = client.patch("/repos", json=[{"id": 1, "stars": 1}, {"id": 2, "stars": 2}])
+
+    assert response.status_code == 413
+
+
+def test_create_repo_serves_stale_row_when_github_fails(client, monkeypatch):
+    """Test that a stored repo is served and revalidated when GitHub fails"""
+    scheduled = []
+
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {"name": repo, "owner": {"login": owner}}
+
+    async def mock_fetch_error(owner: str, repo: str):
+        raise Exception("GitHub API error")
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    monkeypatch.setattr("main.schedule_revalidation", lambda repo_id, owner, repo: scheduled.append(repo))
+    first = client.post("/repos", json={"owner": "swr", "repo_name": "down"})
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch_error)
+    monkeypatch.setattr("crud.REPO_FRESHNESS_SECONDS", 0)
+
+    response = client.post("/repos", json={"owner": "swr", "repo_name": "down"})
+
+    assert response.status_code == 200
+    assert response.json() == first.json()
+    assert response.headers["Warning"] == '110 - "Response is Stale"'
+    assert scheduled == ["down"]
+
+
+def test_create_repos_batch_marks_and_revalidates_stale_rows(client, monkeypatch):
+    """Test that a batch serving stored rows on GitHub failure flags them and revalidates them"""
+    scheduled = []
+
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {"name": repo, "owner": {"login": owner}}
+
+    async def mock_fetch_error(owner: str, repo: str):
+        raise Exception("GitHub API error")
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    monkeypatch.setattr("main.schedule_revalidation", lambda repo_id, owner, repo: scheduled.append(repo_id))
+    stored = client.post("/repos", json={"owner": "swr", "repo_name": "batch-down"}).json()
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch_error)
+    monkeypatch.setattr("crud.REPO_FRESHNESS_SECONDS", 0)
+
+    response = client.post("/repos/batch", json=[{"owner": "swr", "repo_name": "batch-down"}]).json()
+
+    assert response["results"][0]["ok"] is True
+    assert response["results"][0]["stale"] is True
+    assert response["results"][0]["repo"]["id"] == stored["id"]
+    assert scheduled == [stored["id"]]
+
+
+def test_create_repo_matches_tracked_repo_case_insensitively(client, monkeypatch):
+    """Test that a differently cased owner/repo finds the stored row"""
+    calls = []
+
+    async def mock_fetch(owner: str, repo: str):
+        calls.append(repo)
+        return mock_github_response() | {"name": "MixedCase", "owner": {"login": "CaseOwner"}}
+
+    async def mock_fetch_error(owner: str, repo: str):
+        raise Exception("GitHub API error")
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    monkeypatch.setattr("main.schedule_revalidation", lambda repo_id, owner, repo: None)
+    first = client.post("/repos", json={"owner": "CaseOwner", "repo_name": "MixedCase"})
+
+    fresh = client.post("/repos", json={"owner": "caseowner", "repo_name": "mixedcase"})
+    batch = client.post("/repos/batch", json=[{"owner": "CASEOWNER", "repo_name": "MIXEDCASE"}])
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch_error)
+    monkeypatch.setattr("crud.REPO_FRESHNESS_SECONDS", 0)
+    stale = client.post("/repos", json={"owner": "caseowner", "repo_name": "mixedcase"})
+
+    assert calls == ["MixedCase"]
+    assert fresh.status_code == 200
+    assert fresh.json() == first.json()
+    assert batch.json()["results"][0]["repo"]["id"] == first.json()["id"]
+    assert stale.status_code == 200
+    assert stale.json()["id"] == first.json()["id"]
+
+
+def test_create_repo_bounds_wait_on_slow_github(client, monkeypatch):
+    """Test that a slow GitHub is not waited out when a stored row exists"""
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {"name": repo, "owner": {"login": owner}}
+
+    async def mock_fetch_slow(owner: str, repo: str):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    monkeypatch.setattr("main.schedule_revalidation", lambda repo_id, owner, repo: None)
+    client.post("/repos", json={"owner": "swr", "repo_name": "slow"})
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch_slow)
+    monkeypatch.setattr("main.STALE_FETCH_TIMEOUT", 0.05)
+    monkeypatch.setattr("crud.REPO_FRESHNESS_SECONDS", 0)
+
+    start = time.perf_counter()
+    response = client.post("/repos", json={"owner": "swr", "repo_name": "slow"})
+
+    assert response.status_code == 200
+    assert time.perf_counter() - start < 1
+
+
+@pytest.mark.asyncio
+async def test_revalidate_repo_updates_stored_row(monkeypatch):
+    """Test that a background revalidation writes fresh data back"""
+    import main
+    from conftest import TestingAsyncSessionLocal
+    from models import Repository
+
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {"name": repo, "owner": {"login": owner}, "stargazers_count": 77}
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    monkeypatch.setattr("main.AsyncSessionLocal", TestingAsyncSessionLocal)
+    async with TestingAsyncSessionLocal() as db:
+        repo = Repository(name="revalidated", owner="swr", stars=1, url="https://github.com/swr/revalidated")
+        db.add(repo)
+        await db.commit()
+
+    await main.revalidate_repo(repo.id, "swr", "revalidated")
+
+    async with TestingAsyncSessionLocal() as db:
+        repos = await main.find_repositories(db, [("swr", "revalidated")])
+    assert repos[("swr", "revalidated")].stars == 77
+
+
+@pytest.mark.asyncio
+async def test_revalidate_repo_skips_deleted_repo(monkeypatch):
+    """Test that a repo deleted before its revalidation finishes is not re-inserted"""
+    import main
+    from conftest import TestingAsyncSessionLocal
+    from models import Repository
+
+    async def mock_fetch(owner: str, repo: str):
+        return mock_github_response() | {"name": repo, "owner": {"login": owner}}
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    monkeypatch.setattr("main.AsyncSessionLocal", TestingAsyncSessionLocal)
+    async with TestingAsyncSessionLocal() as db:
+        repo = Repository(name="deleted", owner="swr", stars=1, url="https://github.com/swr/deleted")
+        db.add(repo)
+        await db.commit()
+        await db.delete(repo)
+        await db.commit()
+
+    await main.revalidate_repo(repo.id, "swr", "deleted")
+
+    async with TestingAsyncSessionLocal() as db:
+        assert await main.find_repositories(db, [("swr", "deleted")]) == {}
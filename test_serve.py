@@ -0,0 +1,62 @@
+"""
+Test Suite for the Production Server Settings
+Tests serve.py options and the per-worker pool sizing in database.py
+"""
+import pytest
+
+import serve
+from database import pool_sizes
+
+
+def test_server_options_disable_reload():
+    """Test that the production server runs workers without auto-reload"""
+    options = serve.server_options()
+    assert options["workers"] >= 1
+    assert "reload" not in options
+    assert options["loop"] in ("uvloop", "asyncio")
+    assert options["http"] in ("httptools", "h11")
+
+
+def test_pool_sizes_split_budget_across_workers(monkeypatch):
+    """Test that each worker gets its share of the connection budget"""
+    monkeypatch.delenv("DB_POOL_SIZE", raising=False)
+    monkeypatch.delenv("DB_MAX_OVERFLOW", raising=False)
+    assert pool_sizes(max_connections=60, workers=1) == (30, 30)
+    assert pool_sizes(max_connections=60, workers=4) == (7, 8)
+    assert pool_sizes(max_connections=8, workers=8) == (1, 0)
+
+
+def test_pool_sizes_stay_within_budget(monkeypatch):
+    """Test that the derived pools never add up to more than the connection budget"""
+    monkeypatch.delenv("DB_POOL_SIZE", raising=False)
+    monkeypatch.delenv("DB_MAX_OVERFLOW", raising=False)
+    for workers in range(1, 17):
+        for max_connections in range(workers, 101):
+            pool_size, max_overflow = pool_sizes(max_connections, workers)
+            assert pool_size >= 1
+            assert workers * (pool_size + max_overflow) <= max_connections
+
+
+def test_pool_sizes_reject_budget_below_one_per_worker(monkeypatch):
+    """Test that a budget smaller than the worker count is refused"""
+    monkeypatch.delenv("DB_POOL_SIZE", raising=False)
+    monkeypatch.delenv("DB_MAX_OVERFLOW", raising=False)
+    with pytest.raises(ValueError):
+        pool_sizes(max_connections=4, workers=8)
+
+
+def test_pool_sizes_explicit_settings_win(monkeypatch):
+    """Test that DB_POOL_SIZE and DB_MAX_OVERFLOW override the derived sizes"""
+    monkeypatch.setenv("DB_POOL_SIZE", "5")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+    assert pool_sizes(max_connections=60, workers=4) == (5, 0)
+
+
+def test_refresher_is_refused_with_several_workers(monkeypatch):
+    """Test that serve.py will not start one background refresher per worker"""
+    monkeypatch.setattr("serve.WEB_CONCURRENCY", 4)
+    monkeypatch.setattr("refresher.REFRESH_ENABLED", True)
+    monkeypatch.setattr("serve.uvicorn.run", lambda *args, **kwargs: pytest.fail("server started"))
+
+    with pytest.raises(SystemExit, match="refresher.py"):
+        serve.main()
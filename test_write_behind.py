@@ -0,0 +1,136 @@
+"""
+Test Suite for Write-Behind Star Updates
+Tests write_behind.py and its use by PUT and GET /repos/{repo_id}
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from conftest import TestingAsyncSessionLocal
+from crud import update_stars
+from models import Repository
+from write_behind import StarWriteBuffer
+
+
+async def stored_stars(repo_id):
+    async with TestingAsyncSessionLocal() as db:
+        return await db.scalar(select(Repository.stars).where(Repository.id == repo_id))
+
+
+@pytest.fixture()
+def star_buffer(monkeypatch):
+    """Enable write-behind mode against the test database"""
+    buffer = StarWriteBuffer(session_factory=TestingAsyncSessionLocal, max_pending=100)
+    monkeypatch.setattr("main.star_buffer", buffer)
+    return buffer
+
+
+@pytest.fixture()
+def repo_id(client, monkeypatch):
+    """Create a repository to update"""
+
+    async def mock_fetch(owner: str, repo: str):
+        return {
+            "name": repo,
+            "owner": {"login": owner},
+            "stargazers_count": 1,
+            "html_url": f"https://github.com/{owner}/{repo}"
+        }
+
+    monkeypatch.setattr("main.fetch_github_repo", mock_fetch)
+    return client.post("/repos", json={"owner": "buffered", "repo_name": "hot"}).json()["id"]
+
+
+def test_updates_are_coalesced_until_flush(client, star_buffer, repo_id):
+    """Test that repeated PUTs are buffered, visible to reads and flushed once"""
+    for stars in (10, 20, 30):
+        assert client.put(f"/repos/{repo_id}?stars={stars}").status_code == 200
+
+    assert client.get(f"/repos/{repo_id}").json()["stars"] == 30
+    assert client.post("/repos/lookup", json={"ids": [repo_id]}).json()["items"][0]["stars"] == 30
+    assert asyncio.run(stored_stars(repo_id)) == 1
+    assert star_buffer.coalesced == 2
+
+    asyncio.run(star_buffer.flush())
+
+    assert asyncio.run(stored_stars(repo_id)) == 30
+    assert star_buffer.stats()["pending"] == 0
+    assert client.get(f"/repos/{repo_id}").json()["stars"] == 30
+
+
+def test_buffered_update_of_missing_repo(client, star_buffer):
+    """Test that write-behind mode still reports unknown repositories"""
+    response = client.put("/repos/99999?stars=5")
+    assert response.status_code == 404
+    assert star_buffer.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_flush_on_size_threshold(repo_id):
+    """Test that filling the buffer triggers a flush"""
+    buffer = StarWriteBuffer(session_factory=TestingAsyncSessionLocal, max_pending=1)
+
+    await buffer.put(repo_id, 77)
+
+    assert buffer.flushes == 1
+    assert await stored_stars(repo_id) == 77
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_pending_updates(repo_id):
+    """Test that shutdown writes out whatever is still buffered"""
+    buffer = StarWriteBuffer(session_factory=TestingAsyncSessionLocal, max_pending=100, flush_interval=60)
+    buffer.start()
+    await buffer.put(repo_id, 88)
+
+    await buffer.stop()
+
+    assert await stored_stars(repo_id) == 88
+
+
+def test_bulk_update_overrides_buffered_update(client, star_buffer, repo_id):
+    """Test that a PATCH after a buffered PUT wins, before and after the flush"""
+    client.put(f"/repos/{repo_id}?stars=10")
+
+    response = client.patch("/repos", json=[{"id": repo_id, "stars": 50}])
+
+    assert response.json()["updated"] == 1
+    assert client.get(f"/repos/{repo_id}").json()["stars"] == 50
+    asyncio.run(star_buffer.flush())
+    assert asyncio.run(stored_stars(repo_id)) == 50
+    assert client.get(f"/repos/{repo_id}").json()["stars"] == 50
+
+
+def test_refetch_overrides_buffered_update(client, star_buffer, repo_id, monkeypatch):
+    """Test that re-fetching a stale repo from GitHub drops its buffered PUT"""
+    monkeypatch.setattr("crud.REPO_FRESHNESS_SECONDS", 0)
+    client.put(f"/repos/{repo_id}?stars=10")
+
+    client.post("/repos", json={"owner": "buffered", "repo_name": "hot"})
+
+    assert client.get(f"/repos/{repo_id}").json()["stars"] == 1
+    asyncio.run(star_buffer.flush())
+    assert asyncio.run(stored_stars(repo_id)) == 1
+
+
+@pytest.mark.asyncio
+async def test_direct_write_during_flush_is_not_overwritten(repo_id, monkeypatch):
+    """Test that an id discarded while its flush runs is not committed over the direct write"""
+    buffer = StarWriteBuffer(session_factory=TestingAsyncSessionLocal, max_pending=100)
+    await buffer.put(repo_id, 10)
+
+    async def update_after_direct_write(db, stars_by_id):
+        if repo_id in buffer.flushing:
+            async with TestingAsyncSessionLocal() as direct:
+                await update_stars(direct, {repo_id: 50})
+                buffer.discard(repo_id)
+                await direct.commit()
+        return await update_stars(db, stars_by_id)
+
+    monkeypatch.setattr("write_behind.update_stars", update_after_direct_write)
+    await buffer.flush()
+
+    assert await stored_stars(repo_id) == 50
+    assert buffer.written == 0
+    assert repo_id not in buffer
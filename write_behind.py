@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+
+from cache import repo_cache
+from crud import update_stars
+from database import AsyncSessionLocal
+
+STARS_WRITE_BEHIND = os.getenv("STARS_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "1000"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "1"))
+
+logger = logging.getLogger(__name__)
+
+
+class StarWriteBuffer:
+    # Coalesces star updates per repo id in memory (last write wins) and
+    # writes them with one bulk UPDATE when the buffer fills up or the flush
+    # interval passes.
+    def __init__(self, session_factory=AsyncSessionLocal, max_pending: int = WRITE_BEHIND_MAX_PENDING,
+                 flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL):
+        self.session_factory = session_factory
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.pending = {}
+        self.flushing = {}
+        self.coalesced = 0
+        self.flushes = 0
+        self.written = 0
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def get(self, repo_id: int) -> int | None:
+        # Unflushed value for readers, including one that is being written right now.
+        stars = self.pending.get(repo_id)
+        return self.flushing.get(repo_id) if stars is None else stars
+
+    def __contains__(self, repo_id: int) -> bool:
+        return repo_id in self.pending or repo_id in self.flushing
+
+    async def put(self, repo_id: int, stars: int):
+        if repo_id in self.pending:
+            self.coalesced += 1
+        self.pending[repo_id] = stars
+        if len(self.pending) >= self.max_pending:
+            await self.flush()
+
+    def discard(self, *repo_ids: int):
+        # Drops buffered values for rows that were just written or deleted
+        # directly, so a later flush cannot overwrite the newer value. Values
+        # in a flush that is still running are dropped too; flush() notices
+        # and rolls back rather than commit over the direct write.
+        for repo_id in repo_ids:
+            self.pending.pop(repo_id, None)
+            self.flushing.pop(repo_id, None)
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending:
+                return
+            self.flushing, self.pending = self.pending, {}
+            try:
+                async with self.session_factory() as db:
+                    while self.flushing:
+                        writing = dict(self.flushing)
+                        await update_stars(db, writing)
+                        if writing.keys() == self.flushing.keys():
+                            await db.commit()
+                            break
+                        # Some ids were written directly and discarded while the
+                        # UPDATE ran; redo it without them.
+                        await db.rollback()
+            except Exception:
+                # Keep the values for the next flush unless they were overwritten meanwhile.
+                self.pending = {**self.flushing, **self.pending}
+                raise
+            finally:
+                batch, self.flushing = self.flushing, {}
+            await repo_cache.invalidate(*batch)
+            self.flushes += 1
+            self.written += len(batch)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "written": self.written,
+        }
+
+
+star_buffer = StarWriteBuffer() if STARS_WRITE_BEHIND else None